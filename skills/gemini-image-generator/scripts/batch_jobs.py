@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from google import genai
+
+from common import (
+    MODEL_MAP,
+    DownloadCache,
+    ResponseCache,
+    add_cache_args,
+    build_config,
+    choose_model,
+    generate_content,
+    load_images,
+    make_cache,
+    make_download_cache,
+    make_timestamp_prefix,
+    save_response_images,
+    validate_aspect_ratio,
+    validate_count,
+    validate_image_size,
+    validate_reference_count,
+)
+from logo_overlay import DEFAULT_PROMPT as DEFAULT_LOGO_PROMPT
+
+MODES = {"generate", "edit", "logo"}
+
+
+def job_file_name(job_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", job_id)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run a JSONL manifest of Gemini image jobs with one shared client."
+    )
+    parser.add_argument("manifest", help="JSONL file with one job per line ('-' for stdin).")
+    parser.add_argument(
+        "--results", default="results.jsonl", help="JSONL file for per-job results."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Maximum API requests in flight."
+    )
+    parser.add_argument(
+        "--out-dir", default="outputs", help="Default output directory for images."
+    )
+    add_cache_args(parser, downloads=True)
+    return parser.parse_args()
+
+
+def read_manifest(path: str) -> list[dict]:
+    handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    jobs = []
+    try:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f"Line {line_number}: invalid JSON ({exc})") from exc
+            if not isinstance(job, dict):
+                raise ValueError(f"Line {line_number}: a job must be a JSON object")
+            job.setdefault("id", str(line_number))
+            jobs.append(job)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+    # Ids are unique once sanitized for file names, so no job overwrites another's images.
+    seen = {}
+    for job in jobs:
+        job_id = str(job["id"])
+        name = job_file_name(job_id)
+        if name in seen:
+            if seen[name] == job_id:
+                raise ValueError(f"Duplicate job id: {job_id}")
+            raise ValueError(f"Job ids {seen[name]!r} and {job_id!r} both save images as {name!r}")
+        seen[name] = job_id
+    return jobs
+
+
+def prepare_job(job: dict, downloads: DownloadCache | None) -> tuple[str, list, object, int]:
+    mode = job.get("mode", "generate")
+    if mode not in MODES:
+        raise ValueError(f"Unsupported mode: {mode}")
+    aspect = job.get("aspect", "9:16")
+    count = int(job.get("count", 1))
+    references = job.get("reference", [])
+    if isinstance(references, str):
+        references = [references]
+    size = job.get("size")
+    validate_aspect_ratio(aspect)
+    validate_count(count)
+    if size is not None:
+        validate_image_size(size)
+    validate_reference_count(len(references))
+
+    if mode == "generate":
+        if not job.get("prompt"):
+            raise ValueError("generate jobs require a prompt")
+        contents = job["prompt"]
+        reference_count = 0
+    elif mode == "edit":
+        if not job.get("prompt") or not job.get("input"):
+            raise ValueError("edit jobs require a prompt and an input")
+        contents = [job["prompt"], *load_images([job["input"], *references], cache=downloads)]
+        reference_count = len(references)
+    else:
+        if not job.get("base") or not job.get("logo"):
+            raise ValueError("logo jobs require a base and a logo")
+        contents = [job.get("prompt") or DEFAULT_LOGO_PROMPT, *load_images([job["base"], job["logo"]], cache=downloads)]
+        reference_count = 0
+
+    requested = job.get("model", "pro" if mode == "logo" else "flash")
+    if requested not in MODEL_MAP:
+        raise ValueError(f"Unsupported model: {requested}")
+    model, size = choose_model(
+        requested=requested,
+        size=size,
+        force_pro=mode == "logo",
+        reference_count=reference_count,
+    )
+    modalities = ["IMAGE"] if mode == "generate" else ["TEXT", "IMAGE"]
+    config = build_config(aspect, model, size, response_modalities=modalities)
+    return MODEL_MAP[model], contents, config, count
+
+
+def run_job(
+    client,
+    job: dict,
+    out_dir: str,
+    prefix: str,
+    slots: threading.BoundedSemaphore,
+    cache: ResponseCache | None,
+    downloads: DownloadCache | None,
+) -> dict:
+    job_id = str(job["id"])
+    try:
+        model_name, contents, config, count = prepare_job(job, downloads)
+        request_key = cache.request_key(model_name, contents, config) if cache else None
+        saved_paths = []
+        image_index = 1
+        for variant in range(count):
+            with slots:
+                response = generate_content(
+                    client, model_name, contents, config, variant, cache, request_key
+                )
+            new_paths, image_index = save_response_images(
+                response,
+                job.get("out_dir", out_dir),
+                f"{prefix}_{job_file_name(job_id)}",
+                image_index,
+            )
+            saved_paths.extend(new_paths)
+    except Exception as exc:
+        return {"id": job_id, "status": "error", "paths": [], "error": str(exc)}
+
+    if not saved_paths:
+        return {"id": job_id, "status": "error", "paths": [], "error": "No image data returned by the API."}
+    return {"id": job_id, "status": "ok", "paths": saved_paths, "error": None}
+
+
+def main() -> int:
+    args = parse_args()
+
+    if args.concurrency < 1:
+        print("--concurrency must be at least 1", file=sys.stderr)
+        return 2
+    try:
+        jobs = read_manifest(args.manifest)
+    except (OSError, ValueError) as exc:
+        print(f"Failed to read manifest: {exc}", file=sys.stderr)
+        return 2
+    try:
+        downloads = make_download_cache(args)
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+
+    client = genai.Client()
+    prefix = make_timestamp_prefix()
+    # Jobs load their images in parallel; the semaphore caps requests in flight.
+    slots = threading.BoundedSemaphore(args.concurrency)
+    cache = make_cache(args)
+    failed = 0
+
+    with open(args.results, "w", encoding="utf-8") as results, ThreadPoolExecutor(
+        max_workers=args.concurrency * 2
+    ) as executor:
+        futures = [
+            executor.submit(run_job, client, job, args.out_dir, prefix, slots, cache, downloads)
+            for job in jobs
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.write(json.dumps(result) + "\n")
+            results.flush()
+            if result["status"] == "ok":
+                print(f"{result['id']}: {', '.join(result['paths'])}")
+            else:
+                failed += 1
+                print(f"{result['id']}: {result['error']}", file=sys.stderr)
+
+    print(f"{len(jobs) - failed}/{len(jobs)} jobs succeeded; results in {args.results}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
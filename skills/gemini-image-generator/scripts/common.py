@@ -1,11 +1,20 @@
+import argparse
 import base64
+import hashlib
 import io
+import json
 import os
+import shutil
 import sys
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image
 from google.genai import types
 
@@ -29,18 +38,189 @@ MODEL_MAP = {
     "pro": "gemini-3-pro-image-preview",
 }
 
+# Connect and read timeouts for each image download, in seconds.
+FETCH_TIMEOUT = (10, 30)
+FETCH_WORKERS = 8
+
+CACHE_DIR = os.environ.get(
+    "GEMINI_IMAGE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "gemini-image-generator", "responses"),
+)
+CACHE_MAX_BYTES = int(float(os.environ.get("GEMINI_IMAGE_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+
+DOWNLOAD_CACHE_DIR = os.environ.get(
+    "GEMINI_IMAGE_DOWNLOAD_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "gemini-image-generator", "downloads"),
+)
+DOWNLOAD_CACHE_MAX_BYTES = int(float(os.environ.get("GEMINI_IMAGE_DOWNLOAD_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
 
 def is_url(value: str) -> bool:
     parsed = urlparse(value)
     return parsed.scheme in {"http", "https"} and bool(parsed.netloc)
 
 
-def load_image(source: str) -> Image.Image:
-    if is_url(source):
-        response = requests.get(source, timeout=30)
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    # One keep-alive connection pool per process, shared by all download threads.
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def evict_lru(directory: str, max_bytes: int) -> None:
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.name.startswith("."):
+            continue
+        try:
+            if entry.is_dir():
+                size = sum(item.stat().st_size for item in os.scandir(entry.path))
+            else:
+                size = entry.stat().st_size
+            entries.append((entry.stat().st_mtime, size, entry.path))
+        except OSError:
+            continue
+        total += size
+    # Least recently used entries go first.
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+
+
+class DownloadCache:
+    """Downloaded images kept on disk and revalidated with ETag/Last-Modified."""
+
+    def __init__(
+        self,
+        directory: str = DOWNLOAD_CACHE_DIR,
+        max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES,
+        offline: bool = False,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+
+    def read(self, path: str) -> tuple[dict, bytes] | None:
+        # Each entry is one JSON line of validators followed by the body.
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def write(self, path: str, meta: dict, body: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(meta).encode() + b"\n")
+            f.write(body)
+        os.replace(tmp_path, path)
+        evict_lru(self.directory, self.max_bytes)
+
+    def fetch(self, url: str, timeout: tuple[float, float] = FETCH_TIMEOUT) -> bytes:
+        path = os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+        cached = self.read(path)
+        if self.offline:
+            if cached is None:
+                raise FileNotFoundError(f"{url} is not in the download cache (offline mode)")
+            os.utime(path)
+            return cached[1]
+
+        headers = {}
+        if cached is not None:
+            if cached[0].get("etag"):
+                headers["If-None-Match"] = cached[0]["etag"]
+            if cached[0].get("last_modified"):
+                headers["If-Modified-Since"] = cached[0]["last_modified"]
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            os.utime(path)
+            return cached[1]
         response.raise_for_status()
-        return Image.open(io.BytesIO(response.content))
-    return Image.open(source)
+
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        self.write(path, meta, response.content)
+        return response.content
+
+
+# SHA-256 of the file or download each loaded image was decoded from, by id(image).
+_source_digests = {}
+
+
+def remember_source_digest(image: Image.Image, data: bytes) -> None:
+    key = id(image)
+    _source_digests[key] = hashlib.sha256(data).digest()
+    weakref.finalize(image, _source_digests.pop, key, None)
+
+
+def image_digest(image: Image.Image) -> bytes:
+    digest = _source_digests.get(id(image))
+    if digest is not None:
+        return digest
+    # Images not loaded through load_image: hash the decoded content, including
+    # the palette, since "P" pixels are only indices into it.
+    digest = hashlib.sha256(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    digest.update(bytes(image.getpalette() or []))
+    digest.update(repr(image.info.get("transparency")).encode())
+    digest.update(image.tobytes())
+    return digest.digest()
+
+
+def load_image(
+    source: str,
+    timeout: tuple[float, float] = FETCH_TIMEOUT,
+    cache: DownloadCache | None = None,
+) -> Image.Image:
+    if is_url(source):
+        if cache is not None:
+            data = cache.fetch(source, timeout)
+        else:
+            response = get_session().get(source, timeout=timeout)
+            response.raise_for_status()
+            data = response.content
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    image = Image.open(io.BytesIO(data))
+    remember_source_digest(image, data)
+    return image
+
+
+def load_images(
+    sources: list[str],
+    timeout: tuple[float, float] = FETCH_TIMEOUT,
+    cache: DownloadCache | None = None,
+) -> list[Image.Image]:
+    if len(sources) <= 1:
+        return [load_image(source, timeout, cache) for source in sources]
+    with ThreadPoolExecutor(max_workers=min(len(sources), FETCH_WORKERS)) as executor:
+        futures = [executor.submit(load_image, source, timeout, cache) for source in sources]
+        return [future.result() for future in futures]
 
 
 def validate_aspect_ratio(aspect: str) -> None:
@@ -48,6 +228,11 @@ def validate_aspect_ratio(aspect: str) -> None:
         raise ValueError(f"Unsupported aspect ratio: {aspect}")
 
 
+def validate_image_size(size: str) -> None:
+    if size not in IMAGE_SIZES:
+        raise ValueError(f"Unsupported image size: {size} (choose from {', '.join(sorted(IMAGE_SIZES))})")
+
+
 def validate_count(count: int) -> None:
     if count < 1 or count > 3:
         raise ValueError("--count must be between 1 and 3")
@@ -83,6 +268,151 @@ def build_config(aspect: str, model: str, size: str | None, response_modalities:
     )
 
 
+class ResponseCache:
+    """Images returned for a request, stored on disk under a hash of everything sent."""
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, refresh: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+
+    def request_key(self, model: str, contents, config: types.GenerateContentConfig) -> str:
+        digest = hashlib.sha256()
+
+        def add(kind: bytes, data: bytes) -> None:
+            digest.update(kind + len(data).to_bytes(8, "big") + data)
+
+        add(b"model", model.encode())
+        add(b"config", config.model_dump_json(exclude_none=True).encode())
+        for item in contents if isinstance(contents, list) else [contents]:
+            if isinstance(item, Image.Image):
+                add(b"image", image_digest(item))
+            else:
+                add(b"text", str(item).encode())
+        return digest.hexdigest()
+
+    def key(self, request_key: str, variant: int) -> str:
+        # Each --count variant is a separate sample, so it gets its own entry.
+        return hashlib.sha256(f"{request_key}:{variant}".encode()).hexdigest()
+
+    def get(self, key: str) -> list[bytes] | None:
+        if self.refresh:
+            return None
+        entry = os.path.join(self.directory, key)
+        try:
+            names = sorted(os.listdir(entry))
+            images = []
+            for name in names:
+                with open(os.path.join(entry, name), "rb") as f:
+                    images.append(f.read())
+            os.utime(entry)
+        except OSError:
+            return None
+        return images or None
+
+    def put(self, key: str, images: list[bytes]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        for index, data in enumerate(images):
+            with open(os.path.join(tmp_dir, f"{index:02d}.png"), "wb") as f:
+                f.write(data)
+        entry = os.path.join(self.directory, key)
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, entry)
+        except OSError:
+            # Another request stored the same entry first.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        evict_lru(self.directory, self.max_bytes)
+
+
+def add_cache_args(parser: argparse.ArgumentParser, downloads: bool = False) -> None:
+    caches = "response and download caches" if downloads else "response cache"
+    parser.add_argument(
+        "--no-cache", action="store_true", help=f"Do not read or write the {caches}."
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="Ignore cached responses and store fresh ones."
+    )
+    if downloads:
+        parser.add_argument(
+            "--offline", action="store_true", help="Load image URLs from the download cache only."
+        )
+
+
+def make_cache(args: argparse.Namespace) -> ResponseCache | None:
+    if args.no_cache:
+        return None
+    return ResponseCache(refresh=args.refresh)
+
+
+def make_download_cache(args: argparse.Namespace) -> DownloadCache | None:
+    if args.no_cache:
+        if args.offline:
+            raise ValueError("--offline needs the download cache; drop --no-cache")
+        return None
+    return DownloadCache(offline=args.offline)
+
+
+def cached_response(images: list[bytes]) -> types.GenerateContentResponse:
+    parts = [types.Part.from_bytes(data=data, mime_type="image/png") for data in images]
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))]
+    )
+
+
+def generate_content(
+    client,
+    model: str,
+    contents,
+    config: types.GenerateContentConfig,
+    variant: int = 0,
+    cache: ResponseCache | None = None,
+    request_key: str | None = None,
+):
+    key = None
+    if cache:
+        key = cache.key(request_key or cache.request_key(model, contents, config), variant)
+    if key:
+        images = cache.get(key)
+        if images is not None:
+            return cached_response(images)
+    response = client.models.generate_content(model=model, contents=contents, config=config)
+    if key:
+        images = [data for data in (inline_data_bytes(part) for part in get_parts(response)) if data]
+        if images:
+            cache.put(key, images)
+    return response
+
+
+def generate_variants(
+    client,
+    model: str,
+    contents,
+    config: types.GenerateContentConfig,
+    count: int,
+    cache: ResponseCache | None = None,
+) -> tuple[list, list[Exception]]:
+    # The inputs are hashed once; each variant only adds its number to the key.
+    request_key = cache.request_key(model, contents, config) if cache else None
+    # Requests run concurrently; responses come back in request order so file numbering stays stable.
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [
+            executor.submit(generate_content, client, model, contents, config, variant, cache, request_key)
+            for variant in range(count)
+        ]
+    # A failed request does not discard the variants that succeeded.
+    responses = []
+    errors = []
+    for future in futures:
+        exc = future.exception()
+        if exc is None:
+            responses.append(future.result())
+        else:
+            errors.append(exc)
+    return responses, errors
+
+
 def get_parts(response):
     if getattr(response, "parts", None):
         return response.parts
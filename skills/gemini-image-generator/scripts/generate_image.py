@@ -7,8 +7,11 @@ from google import genai
 from common import (
     IMAGE_SIZES,
     MODEL_MAP,
+    add_cache_args,
     build_config,
     choose_model,
+    generate_variants,
+    make_cache,
     make_timestamp_prefix,
     save_response_images,
     validate_aspect_ratio,
@@ -41,6 +44,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--out-dir", default="outputs", help="Output directory for images."
     )
+    add_cache_args(parser)
     return parser.parse_args()
 
 
@@ -67,13 +71,15 @@ def main() -> int:
     saved_paths = []
     image_index = 1
 
-    for _ in range(args.count):
-        response = client.models.generate_content(
-            model=MODEL_MAP[model],
-            contents=args.prompt,
-            config=config,
-        )
-
+    responses, errors = generate_variants(
+        client,
+        MODEL_MAP[model],
+        args.prompt,
+        config,
+        args.count,
+        make_cache(args),
+    )
+    for response in responses:
         new_paths, image_index = save_response_images(
             response,
             args.out_dir,
@@ -82,14 +88,18 @@ def main() -> int:
         )
         saved_paths.extend(new_paths)
 
+    for exc in errors:
+        print(f"Image request failed: {exc}", file=sys.stderr)
+
     if not saved_paths:
-        print("No image data returned by the API.", file=sys.stderr)
+        if not errors:
+            print("No image data returned by the API.", file=sys.stderr)
         return 1
 
     for path in saved_paths:
         print(path)
 
-    return 0
+    return 1 if errors else 0
 
 
 if __name__ == "__main__":
@@ -7,9 +7,13 @@ from google import genai
 from common import (
     IMAGE_SIZES,
     MODEL_MAP,
+    add_cache_args,
     build_config,
     choose_model,
-    load_image,
+    generate_variants,
+    load_images,
+    make_cache,
+    make_download_cache,
     make_timestamp_prefix,
     save_response_images,
     validate_aspect_ratio,
@@ -46,6 +50,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--out-dir", default="outputs", help="Output directory for images."
     )
+    add_cache_args(parser, downloads=True)
     return parser.parse_args()
 
 
@@ -60,8 +65,9 @@ def main() -> int:
         return 2
 
     try:
-        base_image = load_image(args.base)
-        logo_image = load_image(args.logo)
+        base_image, logo_image = load_images(
+            [args.base, args.logo], cache=make_download_cache(args)
+        )
     except Exception as exc:
         print(f"Failed to load images: {exc}", file=sys.stderr)
         return 2
@@ -82,12 +88,15 @@ def main() -> int:
     image_index = 1
 
     contents = [args.prompt, base_image, logo_image]
-    for _ in range(args.count):
-        response = client.models.generate_content(
-            model=MODEL_MAP[model],
-            contents=contents,
-            config=config,
-        )
+    responses, errors = generate_variants(
+        client,
+        MODEL_MAP[model],
+        contents,
+        config,
+        args.count,
+        make_cache(args),
+    )
+    for response in responses:
         new_paths, image_index = save_response_images(
             response,
             args.out_dir,
@@ -96,14 +105,18 @@ def main() -> int:
         )
         saved_paths.extend(new_paths)
 
+    for exc in errors:
+        print(f"Image request failed: {exc}", file=sys.stderr)
+
     if not saved_paths:
-        print("No image data returned by the API.", file=sys.stderr)
+        if not errors:
+            print("No image data returned by the API.", file=sys.stderr)
         return 1
 
     for path in saved_paths:
         print(path)
 
-    return 0
+    return 1 if errors else 0
 
 
 if __name__ == "__main__":
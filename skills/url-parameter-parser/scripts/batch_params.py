@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Batch URL Parameter Extraction
+
+Importable API that turns a whole column of URLs into parameter columns in
+one call, for use from other Python jobs:
+
+    from batch_params import extract_params_batch
+
+    columns = extract_params_batch(df['url'])   # DataFrame of parameter columns
+    columns = extract_params_batch(url_list)    # {name: [value or None, ...]}
+
+Instead of building a dictionary per URL, the batch path deduplicates the
+URLs, finds the query string of every distinct URL with one regular
+expression pass over all of them, splits all queries with a single split on
+'&', and splits and percent-decodes each distinct name=value pair once. URLs outside the fast path
+(see process_csv.extract_query_params) are parsed individually, so results
+always match process_csv.py.
+"""
+
+import re
+from operator import itemgetter
+from urllib.parse import unquote
+
+from process_csv import extract_query_params, make_param_filter
+
+
+# One URL per line: a head without tabs, brackets, '?', '#' or non-ASCII
+# characters, then an optional query and fragment. Lines that do not match
+# entirely are parsed one by one.
+URL_LINE_PATTERN = re.compile(
+    r'^[^\t\r\n\[\]?#\x80-\U0010ffff]*(?:\?([^#\t\r\n]*)(?:#[^\t\r\n]*)?)?$',
+    re.MULTILINE,
+)
+
+# Pair separating the queries of consecutive URLs once all are joined and split on '&'
+QUERY_SEPARATOR = '\n'
+
+
+def to_url_list(urls):
+    """
+    Converts a list, tuple, NumPy array or pandas Series of URLs to a list of strings.
+
+    Missing values (None, NaN) and other non-string items become ''.
+
+    Args:
+        urls: Sequence of URLs
+
+    Returns:
+        List of strings
+    """
+    tolist = getattr(urls, 'tolist', None)
+    values = tolist() if tolist is not None else list(urls)
+    return [value if isinstance(value, str) else '' for value in values]
+
+
+def split_pairs(pairs):
+    """
+    Splits and percent-decodes each distinct name=value pair once.
+
+    Args:
+        pairs: Iterable of raw query pairs
+
+    Returns:
+        Dictionary of {pair: (name, value)}; pairs without '=' or with an
+        empty value are left out, as parse_qs drops them
+    """
+    split = {}
+    for pair in set(pairs):
+        name, _, value = pair.partition('=')
+        if not value:
+            continue
+        if '+' in name:
+            name = name.replace('+', ' ')
+        if '%' in name:
+            name = unquote(name)
+        if '+' in value:
+            value = value.replace('+', ' ')
+        if '%' in value:
+            value = unquote(value)
+        split[pair] = (name, value)
+    return split
+
+
+def parse_unique_urls(unique_urls, accept=None):
+    """
+    Parses distinct URLs into per-parameter columns indexed by URL position.
+
+    Args:
+        unique_urls: List of distinct URL strings
+        accept: Optional predicate on parameter names
+
+    Returns:
+        Dictionary of {param_name: {url_index: value}} in first-seen order,
+        where value is a list when the parameter occurs more than once
+    """
+    columns = {}
+
+    # URLs containing a newline cannot be lines of the combined text
+    fast_indexes = [index for index, url in enumerate(unique_urls) if '\n' not in url]
+    slow_indexes = [index for index, url in enumerate(unique_urls) if '\n' in url]
+
+    text = '\n'.join([unique_urls[index] for index in fast_indexes])
+    matched = {match.start(): match.group(1) for match in URL_LINE_PATTERN.finditer(text)}
+
+    # finditer only yields lines that match entirely; map them back by offset
+    query_indexes = []
+    queries = []
+    offset = 0
+    for index in fast_indexes:
+        url = unique_urls[index]
+        query = matched.get(offset, False)
+        if query is False:
+            if url:
+                slow_indexes.append(index)
+        elif query:
+            query_indexes.append(index)
+            queries.append(query)
+        offset += len(url) + 1
+
+    # One split of all queries at once, and one decode per distinct pair
+    pairs = ('&' + QUERY_SEPARATOR + '&').join(queries).split('&')
+    split = split_pairs(pairs)
+
+    # Slow URLs are parsed when the fast ones reach their position, so names
+    # keep first-seen order
+    slow_indexes.sort()
+    slow_indexes.append(len(unique_urls))
+    slow_position = 0
+
+    def add_slow_urls(before):
+        nonlocal slow_position
+        while slow_indexes[slow_position] < before:
+            slow_index = slow_indexes[slow_position]
+            for name, slow_values in extract_query_params(unique_urls[slow_index], accept).items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = {}
+                column[slow_index] = slow_values[0] if len(slow_values) == 1 else list(slow_values)
+            slow_position += 1
+
+    position = 0
+    index = query_indexes[0] if queries else len(unique_urls)
+    add_slow_urls(index)
+    for pair in pairs:
+        if pair == QUERY_SEPARATOR:
+            position += 1
+            index = query_indexes[position]
+            if slow_indexes[slow_position] < index:
+                add_slow_urls(index)
+            continue
+        parsed = split.get(pair)
+        if parsed is None:
+            continue
+        name, value = parsed
+        if accept is not None and not accept(name):
+            continue
+
+        column = columns.get(name)
+        if column is None:
+            columns[name] = {index: value}
+            continue
+        existing = column.get(index)
+        if existing is None:
+            column[index] = value
+        elif type(existing) is list:
+            existing.append(value)
+        else:
+            column[index] = [existing, value]
+    add_slow_urls(len(unique_urls))
+
+    return columns
+
+
+def extract_params_batch(urls, params=None, join='|'):
+    """
+    Extracts the query parameters of many URLs into columns in one call.
+
+    Args:
+        urls: List, tuple, NumPy array or pandas Series of URL strings
+        params: Optional list of parameter names or globs (e.g. 'utm_*') to extract
+        join: Separator for parameters with several values, as in the CSV
+            output; None keeps lists of values
+
+    Returns:
+        For a pandas Series, a DataFrame with the Series' index and one column per
+        parameter. For a NumPy array, a dictionary of object arrays. Otherwise a
+        dictionary of {param_name: list}. Rows without the parameter hold None.
+    """
+    url_list = to_url_list(urls)
+    accept = make_param_filter(params) if params else None
+
+    # Parse each distinct URL once; codes maps every row to its distinct URL
+    unique = {}
+    codes = [unique.setdefault(url, len(unique)) for url in url_list]
+    unique_urls = list(unique)
+
+    # itemgetter expands each distinct-URL column to all rows in one C call
+    expand = itemgetter(*codes) if len(codes) > 1 else lambda column: tuple(column[code] for code in codes)
+    columns = {}
+    for name, values_by_index in parse_unique_urls(unique_urls, accept).items():
+        column = [None] * len(unique_urls)
+        for index, value in values_by_index.items():
+            if join is None:
+                column[index] = value if type(value) is list else [value]
+            else:
+                column[index] = join.join(value) if type(value) is list else value
+        columns[name] = list(expand(column))
+
+    module = type(urls).__module__.split('.')[0]
+    if module == 'pandas':
+        import pandas as pd
+
+        return pd.DataFrame(columns, index=urls.index, columns=list(columns))
+    if module == 'numpy':
+        import numpy as np
+
+        arrays = {}
+        for name, column in columns.items():
+            array = np.empty(len(column), dtype=object)
+            array[:] = column
+            arrays[name] = array
+        return arrays
+    return columns
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Processing Mode Benchmark
+
+Generates a synthetic tracking CSV with a controllable row count, URL
+duplication rate, parameters per URL and number of distinct parameter names,
+then runs process_csv.py on a fresh copy of it in each processing mode and
+reports rows/sec, MB/sec and peak RSS. Everything runs offline in a
+temporary directory.
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+SCRIPT = Path(__file__).resolve().parent / 'process_csv.py'
+
+# Extra process_csv.py arguments for each mode; {db} and {jobs} are filled in per run
+MODES = {
+    'memory': [],
+    'stream': ['--stream'],
+    'chunked': ['--chunk-size', '1', '--jobs', '{jobs}'],
+    'pipeline': ['-'],
+    'analyze': ['--analyze'],
+    'sqlite': ['--sqlite', '{db}'],
+    'parquet': ['--format', 'parquet'],
+}
+DEFAULT_MODES = ['memory', 'stream', 'chunked', 'pipeline', 'analyze', 'sqlite']
+
+SOURCES = ['google', 'facebook', 'tiktok', 'snapchat', 'applovin', 'unity']
+
+
+def generate_csv(path, rows, duplicate_rate, params_per_url, distinct_keys, seed):
+    """
+    Writes a synthetic tracking CSV.
+
+    Args:
+        path: Output path
+        rows: Number of data rows
+        duplicate_rate: Probability that a row repeats a URL seen earlier
+        params_per_url: Number of query parameters per URL
+        distinct_keys: Number of distinct parameter names drawn from
+        seed: Random seed
+
+    Returns:
+        Size of the file in bytes
+    """
+    rng = random.Random(seed)
+    keys = ['utm_source', 'utm_medium', 'utm_campaign', 'clickid'] + [f"p{i}" for i in range(distinct_keys)]
+    keys = keys[:max(distinct_keys, 1)]
+    params_per_url = min(params_per_url, len(keys))
+    seen = []
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'timestamp', 'url', 'status'])
+        for row_id in range(rows):
+            if seen and rng.random() < duplicate_rate:
+                url = rng.choice(seen)
+            else:
+                params = []
+                for key in rng.sample(keys, params_per_url):
+                    if key == 'utm_source':
+                        value = rng.choice(SOURCES)
+                    elif key == 'clickid':
+                        value = f"{rng.getrandbits(64):016x}"
+                    else:
+                        value = f"v{rng.randint(1, 50)}"
+                    params.append(f"{key}={value}")
+                url = f"https://track.example.com/c/{rng.randint(1000, 9999)}?{'&'.join(params)}"
+                seen.append(url)
+            writer.writerow([row_id, 1700000000 + row_id, url, rng.choice(['ok', 'ok', 'ok', 'blocked'])])
+
+    return path.stat().st_size
+
+
+def run_mode(mode, source, workdir, jobs):
+    """
+    Runs process_csv.py in one mode on a fresh copy of source.
+
+    Args:
+        mode: Key of MODES
+        source: Path of the generated CSV
+        workdir: Directory for the copy and any outputs
+        jobs: Worker count for parallel modes
+
+    Returns:
+        Tuple of (wall seconds, peak RSS in bytes, exit status)
+    """
+    target = workdir / source.name
+    shutil.copyfile(source, target)
+    args = [arg.format(db=workdir / 'bench.db', jobs=jobs) for arg in MODES[mode]]
+    if mode == 'pipeline':
+        command = [sys.executable, str(SCRIPT)] + args
+        stdin = open(target, 'rb')
+    else:
+        command = [sys.executable, str(SCRIPT)] + args + [target.name]
+        stdin = subprocess.DEVNULL
+
+    try:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workdir, stdin=stdin,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # wait4 reports the resource usage of this child (and its reaped workers) only
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+    finally:
+        if stdin is not subprocess.DEVNULL:
+            stdin.close()
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return elapsed, peak_rss, process.returncode
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark process_csv.py processing modes on synthetic data.")
+    parser.add_argument("--rows", type=int, default=200000, help="Number of CSV rows (default: 200000).")
+    parser.add_argument("--duplicate-rate", type=float, default=0.5,
+                        help="Probability that a row repeats an earlier URL (default: 0.5).")
+    parser.add_argument("--params-per-url", type=int, default=5, help="Query parameters per URL (default: 5).")
+    parser.add_argument("--distinct-keys", type=int, default=20,
+                        help="Number of distinct parameter names (default: 20).")
+    parser.add_argument("--modes", default=','.join(DEFAULT_MODES),
+                        help=f"Comma-separated modes to run (default: {','.join(DEFAULT_MODES)}; also: parquet).")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for the chunked mode (default: CPU count).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per mode; the fastest is reported (default: 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    return parser.parse_args()
+
+
+def main():
+    """Main execution."""
+    args = parse_args()
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        print(f"Unknown modes: {', '.join(unknown)}. Choose from: {', '.join(MODES)}")
+        return 2
+    if not 0 <= args.duplicate_rate <= 1:
+        print("--duplicate-rate must be between 0 and 1")
+        return 2
+
+    with tempfile.TemporaryDirectory(prefix='bench_modes_') as tmp:
+        tmp = Path(tmp)
+        source = tmp / 'bench.csv'
+        size = generate_csv(source, args.rows, args.duplicate_rate, args.params_per_url, args.distinct_keys, args.seed)
+        print(f"Generated {args.rows:,} rows ({size / 2**20:.1f} MB), duplicate rate {args.duplicate_rate:.0%}, "
+              f"{args.params_per_url} params per URL, {args.distinct_keys} distinct keys")
+        print(f"{'mode':<10} {'rows/sec':>12} {'MB/sec':>8} {'peak RSS':>10} {'seconds':>8}")
+
+        failed = False
+        for mode in modes:
+            best = None
+            for run in range(args.repeat):
+                workdir = tmp / f"{mode}-{run}"
+                workdir.mkdir()
+                elapsed, peak_rss, returncode = run_mode(mode, source, workdir, args.jobs)
+                shutil.rmtree(workdir)
+                if returncode != 0:
+                    break
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, peak_rss)
+
+            if best is None:
+                print(f"{mode:<10} failed (exit status {returncode})")
+                failed = True
+                continue
+            elapsed, peak_rss = best
+            print(f"{mode:<10} {args.rows / elapsed:12,.0f} {size / 2**20 / elapsed:8.1f} "
+                  f"{peak_rss / 2**20:8.0f}MB {elapsed:8.2f}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Query Parser Conformance Check and Benchmark
+
+Checks that the fast query tokenizer in process_csv.py returns exactly what
+urlparse + parse_qs return, then measures rows/sec for both on realistic
+tracking URLs. With --memory, also compares the memory held by per-row
+parameter dictionaries with the dictionary-encoded ParamTable.
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from param_table import ParamTable
+from process_csv import extract_query_params, extract_query_params_stdlib
+
+
+# Hand-picked inputs covering the corners of urlparse and parse_qs behaviour
+CONFORMANCE_CASES = [
+    None,
+    '',
+    '   ',
+    'https://example.com',
+    'https://example.com/page',
+    'https://example.com/page?',
+    'https://example.com/page?utm_source=google&utm_campaign=summer&id=123',
+    'https://example.com/page?id=1&id=2&id=3',
+    'https://example.com/page?a=&b=2&c',
+    'https://example.com/page?=orphan&&&a=1&',
+    'https://example.com/page?q=a+b&r=a%20b&s=%2B',
+    'https://example.com/page?name%20x=1&na+me=2',
+    'https://example.com/page?bad=%zz&half=%E2%9C&ok=%E2%9C%93',
+    'https://example.com/page?a=1;b=2',
+    'https://example.com/page?a=b=c',
+    'https://example.com/page?a=1#frag?b=2',
+    'https://example.com/page#frag?a=1',
+    'https://example.com/page?a=1#',
+    'https://example.com/page??a=1',
+    'https://example.com/pa\tge?a=1',
+    'https://example.com/page?a=\n1',
+    'https://[::1]/page?a=1',
+    'https://[::1/page?a=1',
+    'https://exa]mple.com/page?a=1',
+    'https://exämple.com/page?a=1',
+    'https://example.com/über?a=ü',
+    'https://example.com/page?ü=ä&x=%C3%BC',
+    '  https://example.com/page?a=1  ',
+    '\x00https://example.com/page?a=1',
+    '/relative/path?a=1',
+    '?a=1',
+    'mailto:user@example.com?subject=hi',
+    'not a url',
+    'myapp://open?deep_link=https%3A%2F%2Fexample.com%2F%3Fa%3D1',
+]
+
+FUZZ_ALPHABET = [
+    'a', 'b', 'utm', '=', '&', '&', '?', '#', '%', '%2', '%20', '%zz', '%E2%9C%93',
+    '+', ';', '/', '//', ':', '[', ']', ' ', '\t', '\n', 'é', 'x.com',
+]
+
+SOURCES = ['google', 'facebook', 'tiktok', 'snapchat', 'applovin', 'unity']
+MEDIUMS = ['cpc', 'cpm', 'social', 'email', 'display']
+
+
+def fuzz_urls(count, seed):
+    """
+    Generates random URL-like strings from an alphabet of delimiter-heavy tokens.
+
+    Args:
+        count: Number of strings to generate
+        seed: Random seed
+
+    Returns:
+        List of strings
+    """
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        prefix = rng.choice(['', 'https://', 'https://example.com/', '//', 'app://'])
+        urls.append(prefix + ''.join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 20))))
+    return urls
+
+
+def tracking_urls(count, seed):
+    """
+    Generates realistic ad-tracking URLs with utm parameters and click ids.
+
+    Args:
+        count: Number of URLs to generate
+        seed: Random seed
+
+    Returns:
+        List of URL strings
+    """
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        params = [
+            f"utm_source={rng.choice(SOURCES)}",
+            f"utm_medium={rng.choice(MEDIUMS)}",
+            f"utm_campaign=summer_sale_{rng.randint(1, 50)}",
+            f"clickid={rng.getrandbits(64):016x}",
+        ]
+        if rng.random() < 0.5:
+            params.append(f"utm_content=ad+creative+{rng.randint(1, 9)}")
+        if rng.random() < 0.3:
+            params.append('redirect=https%3A%2F%2Fshop.example.com%2Fp%3Fsku%3D42')
+        urls.append(f"https://track.example.com/c/{rng.randint(1000, 9999)}?{'&'.join(params)}")
+    return urls
+
+
+def check_conformance(fuzz_count, seed):
+    """
+    Compares the fast tokenizer with the stdlib implementation.
+
+    Args:
+        fuzz_count: Number of fuzzed inputs checked in addition to the fixed cases
+        seed: Random seed for fuzzing
+
+    Returns:
+        List of (url, fast_result, stdlib_result) mismatches
+    """
+    mismatches = []
+    for url in CONFORMANCE_CASES + tracking_urls(1000, seed) + fuzz_urls(fuzz_count, seed):
+        fast = extract_query_params(url)
+        expected = extract_query_params_stdlib(url)
+        # Compare order as well, since column order follows first-seen keys
+        if list(fast.items()) != list(expected.items()):
+            mismatches.append((url, fast, expected))
+    return mismatches
+
+
+def measure(parse, urls, repeat):
+    """
+    Measures parsing throughput.
+
+    Args:
+        parse: Function mapping a URL to its parameters
+        urls: URLs to parse
+        repeat: Number of timing runs; the best run is reported
+
+    Returns:
+        Rows per second
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for url in urls:
+            parse(url)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(urls) / best if best else float('inf')
+
+
+def measure_memory(build, urls):
+    """
+    Measures the memory retained by a structure built from parsed URLs.
+
+    Args:
+        build: Function mapping a list of URLs to the structure to measure
+        urls: URLs to parse
+
+    Returns:
+        Bytes allocated and still held once build returns
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build(urls)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def build_param_dicts(urls):
+    """Parses URLs into one parameter dictionary per row, as the in-memory path used to."""
+    return [extract_query_params(url) for url in urls]
+
+
+def build_param_table(urls):
+    """Parses URLs into a dictionary-encoded ParamTable."""
+    table = ParamTable()
+    for url in urls:
+        table.append(extract_query_params(url))
+    return table
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Check and benchmark the URL query tokenizer.")
+    parser.add_argument("--rows", type=int, default=200000, help="Number of URLs to benchmark (default: 200000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per parser (default: 3).")
+    parser.add_argument("--fuzz", type=int, default=50000, help="Number of fuzzed conformance inputs (default: 50000).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    parser.add_argument("--check-only", action="store_true", help="Only run the conformance check.")
+    parser.add_argument("--memory", action="store_true", help="Also compare per-row parameter memory with ParamTable.")
+    return parser.parse_args()
+
+
+def main():
+    """Main execution."""
+    args = parse_args()
+
+    mismatches = check_conformance(args.fuzz, args.seed)
+    if mismatches:
+        print(f"Conformance check failed: {len(mismatches)} mismatches with parse_qs")
+        for url, fast, expected in mismatches[:10]:
+            print(f"  {url!r}\n    fast:   {fast}\n    stdlib: {expected}")
+        return 1
+    print(f"Conformance check passed ({len(CONFORMANCE_CASES) + 1000 + args.fuzz} inputs).")
+
+    if args.check_only:
+        return 0
+
+    urls = tracking_urls(args.rows, args.seed)
+    before = measure(extract_query_params_stdlib, urls, args.repeat)
+    after = measure(extract_query_params, urls, args.repeat)
+    print(f"urlparse + parse_qs: {before:12,.0f} rows/sec")
+    print(f"fast tokenizer:      {after:12,.0f} rows/sec ({after / before:.2f}x)")
+
+    if args.memory:
+        dicts = measure_memory(build_param_dicts, urls)
+        table = measure_memory(build_param_table, urls)
+        print(f"per-row dicts:       {dicts / 2**20:12,.1f} MiB")
+        print(f"ParamTable:          {table / 2**20:12,.1f} MiB ({1 - table / dicts:.0%} less)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Columnar Output for the URL Parameter Parser
+
+Writes enriched CSV rows as Parquet or Arrow IPC stream files in row groups,
+so downstream analytics can load them without re-parsing strings.
+Requires pyarrow (pip install pyarrow).
+"""
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# Output formats and the file suffix used for each
+COLUMNAR_FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrows',
+}
+
+# Number of rows buffered per Parquet row group / Arrow record batch
+ROW_GROUP_ROWS = 65536
+
+
+def pyarrow_available():
+    """Returns True if pyarrow can be imported."""
+    return pa is not None
+
+
+class ColumnarWriter:
+    """
+    Accumulates row dictionaries column by column and writes them in row groups.
+
+    All columns are strings. Missing values (short rows, parameters absent
+    from a URL) are written as nulls. Parquet dictionary-encodes repetitive
+    columns itself; Arrow stream batches are dictionary-encoded per batch and
+    zstd-compressed.
+    """
+
+    def __init__(self, path, fieldnames, output_format, row_group_rows=ROW_GROUP_ROWS):
+        if not pyarrow_available():
+            raise RuntimeError("pyarrow is required for columnar output. Install it with: pip install pyarrow")
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unsupported columnar format: {output_format}")
+
+        self.fieldnames = list(fieldnames)
+        self.output_format = output_format
+        self.row_group_rows = row_group_rows
+        self.columns = [[] for _ in self.fieldnames]
+        self.rows_written = 0
+
+        if output_format == 'parquet':
+            self.schema = pa.schema([(name, pa.string()) for name in self.fieldnames])
+            self.writer = pq.ParquetWriter(str(path), self.schema, use_dictionary=True)
+            self.sink = None
+        else:
+            self.schema = pa.schema([(name, pa.dictionary(pa.int32(), pa.string())) for name in self.fieldnames])
+            self.sink = pa.OSFile(str(path), 'wb')
+            options = pa.ipc.IpcWriteOptions(compression='zstd')
+            self.writer = pa.ipc.new_stream(self.sink, self.schema, options=options)
+
+    def writerows(self, rows):
+        """Buffers rows, writing a row group each time row_group_rows are pending."""
+        for row in rows:
+            for values, name in zip(self.columns, self.fieldnames):
+                values.append(row.get(name))
+            if len(self.columns[0]) >= self.row_group_rows:
+                self.flush()
+
+    def flush(self):
+        """Writes the buffered rows as one row group."""
+        if not self.columns or not self.columns[0]:
+            return
+
+        arrays = [pa.array(values, type=pa.string()) for values in self.columns]
+        if self.output_format == 'parquet':
+            self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        else:
+            arrays = [array.dictionary_encode() for array in arrays]
+            self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+
+        self.rows_written += len(self.columns[0])
+        self.columns = [[] for _ in self.fieldnames]
+
+    def close(self):
+        """Flushes pending rows and closes the file."""
+        self.flush()
+        self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Probabilistic Sketches for URL Parameter Analytics
+
+Bounded-memory summaries of parameter values: exact counts for parameters
+with few distinct values, then HyperLogLog for distinct counts and a
+count-min sketch with a top-k candidate set for heavy hitters, plus exact
+fill/null counters. All sketches can be merged, so files analyzed in separate
+processes combine into one report.
+"""
+
+import math
+from array import array
+from hashlib import blake2b
+
+
+# HyperLogLog precision: 2**12 registers, about 1.6% standard error
+HLL_PRECISION = 12
+
+# Count-min sketch dimensions: error about 2/width of the total count with probability 1 - 2**-depth
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+
+# Number of most frequent values reported per parameter
+TOP_K = 10
+
+# Distinct values counted exactly before a parameter switches to sketches
+EXACT_VALUES = 256
+
+# Parameter names tracked individually; further names share the 'other_params' sketch.
+# Worst case, every tracked name holds sketches of about 70 KB: about 18 MB in all.
+MAX_TRACKED_PARAMS = 256
+
+MASK_64 = (1 << 64) - 1
+
+
+def hash64(value):
+    """
+    Hashes a string to a 64-bit integer shared by all sketches.
+
+    Args:
+        value: String to hash
+
+    Returns:
+        Integer in [0, 2**64)
+    """
+    return int.from_bytes(blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Estimates the number of distinct values in fixed memory."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add_hash(self, hashed):
+        """Adds a value given its hash64."""
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Merges another HyperLogLog of the same precision into this one."""
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self):
+        """Returns the estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+
+class CountMinSketch:
+    """Estimates value frequencies in fixed memory; estimates never undercount."""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('L', bytes(array('L').itemsize * width)) for _ in range(depth)]
+
+    def _indexes(self, hashed):
+        # Double hashing: derive depth indexes from the two halves of one hash
+        low = hashed & 0xFFFFFFFF
+        high = hashed >> 32
+        return [(low + i * high) % self.width for i in range(self.depth)]
+
+    def add_hash(self, hashed, count=1):
+        """Adds count occurrences of a value given its hash64 and returns its new estimate."""
+        estimate = None
+        for row, index in zip(self.rows, self._indexes(hashed)):
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate
+
+    def estimate_hash(self, hashed):
+        """Returns the estimated count of a value given its hash64."""
+        return min(row[index] for row, index in zip(self.rows, self._indexes(hashed)))
+
+    def merge(self, other):
+        """Adds the counters of another sketch with the same dimensions."""
+        for row, other_row in zip(self.rows, other.rows):
+            for index, count in enumerate(other_row):
+                if count:
+                    row[index] += count
+
+
+class ParamSketch:
+    """
+    Fill count, distinct estimate and heavy hitters for one parameter.
+
+    Values are counted exactly until more than exact_values distinct values
+    are seen; only then are the HyperLogLog and count-min sketch (about 70 KB)
+    allocated, so the long tail of rare parameters stays small.
+    """
+
+    def __init__(self, top_k=TOP_K, exact_values=EXACT_VALUES):
+        self.rows = 0
+        self.values = 0
+        self.top_k = top_k
+        self.exact_values = exact_values
+        self.counts = {}
+        self.distinct = None
+        self.frequencies = None
+        self.top = {}
+
+    def add(self, values):
+        """Adds the values of this parameter for one row."""
+        self.rows += 1
+        for value in values:
+            self.values += 1
+            self._add_value(value, 1)
+
+    def _add_value(self, value, count):
+        counts = self.counts
+        if counts is not None:
+            counts[value] = counts.get(value, 0) + count
+            if len(counts) > self.exact_values:
+                self._promote()
+            return
+        hashed = hash64(value)
+        self.distinct.add_hash(hashed)
+        self._offer(value, self.frequencies.add_hash(hashed, count))
+
+    def _promote(self):
+        # Switch from exact counts to fixed-memory sketches
+        counts = self.counts
+        self.counts = None
+        self.distinct = HyperLogLog()
+        self.frequencies = CountMinSketch()
+        self.top = {}
+        for value, count in counts.items():
+            self._add_value(value, count)
+
+    def _offer(self, value, estimate):
+        # Keep the top_k values with the highest count-min estimates
+        top = self.top
+        if value in top or len(top) < self.top_k:
+            top[value] = estimate
+            return
+        smallest = min(top, key=top.get)
+        if estimate > top[smallest]:
+            del top[smallest]
+            top[value] = estimate
+
+    def merge(self, other):
+        """Merges the sketch of the same parameter from another file."""
+        self.rows += other.rows
+        self.values += other.values
+        if other.counts is not None:
+            for value, count in other.counts.items():
+                self._add_value(value, count)
+            return
+        if self.counts is not None:
+            self._promote()
+        self.distinct.merge(other.distinct)
+        self.frequencies.merge(other.frequencies)
+        candidates = set(self.top) | set(other.top)
+        self.top = {}
+        for value in candidates:
+            self._offer(value, self.frequencies.estimate_hash(hash64(value)))
+
+    def report(self, total_rows):
+        """Returns a JSON-serializable summary; counts are exact until the sketches are in use."""
+        if self.counts is not None:
+            distinct = len(self.counts)
+            top = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:self.top_k]
+        else:
+            distinct = self.distinct.estimate()
+            top = sorted(self.top.items(), key=lambda item: (-item[1], item[0]))
+        return {
+            'rows': self.rows,
+            'null_rows': total_rows - self.rows,
+            'fill_rate': round(self.rows / total_rows, 6) if total_rows else 0.0,
+            'values': self.values,
+            'distinct_estimate': distinct,
+            'top_values': [{'value': value, 'count_estimate': count} for value, count in top],
+        }
+
+
+class ParamAnalyzer:
+    """
+    Accumulates per-parameter sketches over the rows of one or more files.
+
+    At most max_params parameter names are tracked individually (the first
+    seen); the values of all other names are pooled into one 'other_params'
+    sketch, so memory stays bounded however many distinct names occur.
+    """
+
+    def __init__(self, top_k=TOP_K, max_params=MAX_TRACKED_PARAMS):
+        self.top_k = top_k
+        self.max_params = max_params
+        self.rows = 0
+        self.rows_with_params = 0
+        self.params = {}
+        self.other = ParamSketch(top_k)
+        self.other_names = None
+
+    def add_row(self, params):
+        """Adds the parsed parameters ({name: [values]}) of one row."""
+        self.rows += 1
+        if not params:
+            return
+        self.rows_with_params += 1
+        other_values = None
+        for name, values in params.items():
+            sketch = self.params.get(name)
+            if sketch is None:
+                if len(self.params) >= self.max_params:
+                    self._add_other_name(name)
+                    other_values = other_values or []
+                    other_values.extend(values)
+                    continue
+                sketch = self.params[name] = ParamSketch(self.top_k)
+            sketch.add(values)
+        if other_values is not None:
+            self.other.add(other_values)
+
+    def _add_other_name(self, name):
+        if self.other_names is None:
+            self.other_names = HyperLogLog()
+        self.other_names.add_hash(hash64(name))
+
+    def param_count(self):
+        """Returns the number of distinct parameter names, estimated beyond max_params."""
+        return len(self.params) + (self.other_names.estimate() if self.other_names is not None else 0)
+
+    def merge(self, other):
+        """Merges an analyzer that saw other rows."""
+        self.rows += other.rows
+        self.rows_with_params += other.rows_with_params
+        for name, sketch in other.params.items():
+            if name in self.params:
+                self.params[name].merge(sketch)
+            elif len(self.params) < self.max_params:
+                self.params[name] = sketch
+            else:
+                # Rows are counted per name here, so other_params rows may be overcounted
+                self._add_other_name(name)
+                self.other.merge(sketch)
+        if other.other_names is not None:
+            if self.other_names is None:
+                self.other_names = HyperLogLog()
+            self.other_names.merge(other.other_names)
+        self.other.merge(other.other)
+
+    def report(self):
+        """Returns a JSON-serializable report, parameters ordered by fill count."""
+        ordered = sorted(self.params.items(), key=lambda item: -item[1].rows)
+        report = {
+            'rows': self.rows,
+            'rows_with_params': self.rows_with_params,
+            'parameters': {name: sketch.report(self.rows) for name, sketch in ordered},
+        }
+        if self.other_names is not None:
+            report['other_params'] = {'names_estimate': self.other_names.estimate(), **self.other.report(self.rows)}
+        return report
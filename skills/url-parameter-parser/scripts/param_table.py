@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compact In-Memory Storage for Parsed URL Parameters
+
+Holds the parameters of every row of a file as dictionary-encoded integer
+pairs in flat arrays instead of one dictionary of fresh lists per row.
+Parameter names and values that repeat across rows (utm_source=facebook) are
+stored once and referenced by id.
+"""
+
+import sys
+from array import array
+
+
+class ParamTable:
+    """
+    Append-only table of per-row parameters.
+
+    Each row is a run of (name id, value id) pairs in one array; a second
+    array holds the offset at which each row's run starts. Rows are decoded
+    back into {name: [values]} dictionaries one at a time when written.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.name_ids = {}
+        self.values = []
+        self.value_ids = {}
+        self.pairs = array('L')
+        self.offsets = array('L', [0])
+
+    def append(self, params):
+        """Adds the parsed parameters ({name: [values]}) of the next row."""
+        name_ids = self.name_ids
+        value_ids = self.value_ids
+        pairs = self.pairs
+        for name, values in params.items():
+            name_id = name_ids.get(name)
+            if name_id is None:
+                name_id = name_ids[name] = len(self.names)
+                self.names.append(sys.intern(name))
+            for value in values:
+                value_id = value_ids.get(value)
+                if value_id is None:
+                    value_id = value_ids[value] = len(self.values)
+                    self.values.append(value)
+                pairs.append(name_id)
+                pairs.append(value_id)
+        self.offsets.append(len(pairs))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        """Decodes the parameters of one row into a new {name: [values]} dictionary."""
+        names = self.names
+        values = self.values
+        pairs = self.pairs
+        params = {}
+        for position in range(self.offsets[index], self.offsets[index + 1], 2):
+            name = names[pairs[position]]
+            value = values[pairs[position + 1]]
+            if name in params:
+                params[name].append(value)
+            else:
+                params[name] = [value]
+        return params
+
+    def nbytes(self):
+        """Returns the approximate memory held by the table, including the distinct strings."""
+        size = sys.getsizeof(self.pairs) + sys.getsizeof(self.offsets)
+        for items, ids in ((self.names, self.name_ids), (self.values, self.value_ids)):
+            size += sys.getsizeof(items) + sys.getsizeof(ids) + sum(sys.getsizeof(item) for item in items)
+        return size
@@ -5,16 +5,86 @@ CSV URL Parameter Parser
 Extracts query parameters from URLs in CSV files and adds them as new columns.
 """
 
+import argparse
 import csv
-import sys
-from urllib.parse import urlparse, parse_qs
+import gzip
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import translate
+from functools import lru_cache, partial
+from itertools import chain, islice
+from urllib.parse import urlparse, parse_qs, unquote, urlencode
 from pathlib import Path
 import shutil
+import sys
+import time
+
+from param_sketches import ParamAnalyzer
+from param_table import ParamTable
+from run_stats import NO_STATS, RunStats, peak_rss_bytes
+
+
+# Number of enriched rows held in memory before they are flushed in streaming mode
+STREAM_BUFFER_ROWS = 1000
+
+# Block size used when scanning a file for record boundaries
+SCAN_BLOCK_BYTES = 1024 * 1024
+
+# Default number of distinct URLs whose parsed parameters are kept in the LRU cache
+URL_CACHE_SIZE = 10000
+
+# Column holding the parameters that did not get a column of their own (see --max-params)
+OVERFLOW_COLUMN = '_other_params'
+
+# Marker for add_param_columns: every parameter without a column goes to OVERFLOW_COLUMN
+ALL_OTHER_PARAMS = object()
+
+# Rows read ahead in pipeline mode to choose the parameter columns before writing the header
+LOOKAHEAD_ROWS = 10000
+
+# Nested URLs in parameter values (see --expand-nested): default depth, column name
+# separator (e.g. redirect.utm_source) and number of inner URLs kept in the expansion cache
+NESTED_DEPTH = 2
+NESTED_SEPARATOR = '.'
+NESTED_CACHE_SIZE = 10000
+
+# Parameter values that are absolute, scheme-relative or root-relative URLs with a query string
+NESTED_URL_PATTERN = re.compile(r'(?:(?:[A-Za-z][A-Za-z0-9+.-]*:)?//|/)[^\s?#]*\?')
+
+# Output formats; columnar formats are written next to the CSV by columnar_writer.py
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow')
+
+# Compressed inputs are detected by magic bytes, falling back to the file suffix
+COMPRESSION_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+COMPRESSION_SUFFIXES = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+# Patterns used to find CSV files when no files are given
+CSV_GLOBS = ('*.csv', '*.csv.gz', '*.csv.zst')
+
+# Suffixes of the files written by incremental mode next to each input CSV
+ENRICHED_SUFFIX = '.enriched.csv'
+CHECKPOINT_SUFFIX = '.checkpoint.json'
 
+# Progress file of --resumable runs, and the number of rows processed between its updates
+RESUME_SUFFIX = '.resume.json'
+RESUME_CHECKPOINT_ROWS = 100000
 
-def extract_query_params(url):
+
+def extract_query_params_stdlib(url):
     """
-    Extracts all query parameters from a URL.
+    Extracts all query parameters from a URL with urlparse and parse_qs.
+
+    Reference implementation for extract_query_params, which falls back to it
+    for URLs outside its fast path.
 
     Args:
         url: URL string to parse
@@ -37,102 +107,2086 @@ def extract_query_params(url):
         return {}
 
 
-def process_csv_files(csv_paths=None):
+def extract_query_params(url, accept=None):
     """
-    Process CSV files and extract URL parameters.
+    Extracts all query parameters from a URL.
+
+    Takes the substring between the first '?' and '#', splits it on '&' and '='
+    and percent-decodes names and values, giving the same result as
+    extract_query_params_stdlib without building a full urlparse result.
+    URLs that urlparse would rewrite or reject (embedded tabs/newlines,
+    bracketed or non-ASCII hosts) are handed to the stdlib implementation.
 
     Args:
-        csv_paths: List of CSV file paths. If None, processes all CSV files in current directory.
+        url: URL string to parse
+        accept: Optional predicate on parameter names (see make_param_filter).
+            Values of rejected parameters are skipped without being decoded.
+
+    Returns:
+        Dictionary of {param_name: [values]}
     """
-    # If no specific files provided, process all CSV files in current directory
-    if csv_paths is None or len(csv_paths) == 0:
-        csv_files = list(Path('.').glob('*.csv'))
-    else:
-        csv_files = [Path(p) for p in csv_paths]
+    if not url:
+        return {}
 
-    if not csv_files:
-        print("No CSV files found to process.")
-        return
+    query_start = url.find('?')
+    if query_start == -1:
+        return {}
 
-    for csv_path in csv_files:
-        print(f"Processing {csv_path}...")
+    fragment_start = url.find('#', 0, query_start)
+    if fragment_start != -1:
+        # '?' inside the fragment does not start a query
+        return {}
 
-        try:
-            # Read CSV file
-            with open(csv_path, 'r', encoding='utf-8', newline='') as f:
-                reader = csv.DictReader(f)
-                original_headers = reader.fieldnames
-                rows = list(reader)
-
-            if not original_headers:
-                print(f"Warning: No headers found in {csv_path}. Skipping.")
-                continue
+    head = url[:query_start]
+    if '\t' in url or '\r' in url or '\n' in url or '[' in head or ']' in head or not head.isascii():
+        params = extract_query_params_stdlib(url)
+        if accept is None:
+            return params
+        return {name: values for name, values in params.items() if accept(name)}
 
-            # Find URL column (case insensitive)
-            url_column = None
-            for col in original_headers:
-                if col.lower() == 'url':
-                    url_column = col
-                    break
+    fragment_start = url.find('#', query_start)
+    query = url[query_start + 1:] if fragment_start == -1 else url[query_start + 1:fragment_start]
 
-            if not url_column:
-                print(f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
-                continue
+    params = {}
+    for pair in query.split('&'):
+        name, _, value = pair.partition('=')
+        # Pairs without '=' or with an empty value are dropped, as parse_qs does
+        if not value:
+            continue
+        if '+' in name:
+            name = name.replace('+', ' ')
+        if '%' in name:
+            name = unquote(name)
+        if accept is not None and not accept(name):
+            continue
+        if '+' in value:
+            value = value.replace('+', ' ')
+        if '%' in value:
+            value = unquote(value)
+
+        values = params.get(name)
+        if values is None:
+            params[name] = [value]
+        else:
+            values.append(value)
+    return params
+
+
+def make_param_filter(patterns):
+    """
+    Builds a predicate accepting the parameter names selected by patterns.
+
+    Patterns are exact names or shell-style globs such as 'utm_*'. Decisions
+    are memoized per name, since the same names recur on every row.
+
+    Args:
+        patterns: List of parameter names or glob patterns
+
+    Returns:
+        Function mapping a parameter name to True if it is selected
+    """
+    exact = {pattern for pattern in patterns if not re.search(r'[*?\[]', pattern)}
+    globs = [pattern for pattern in patterns if pattern not in exact]
+    match = re.compile('|'.join(translate(pattern) for pattern in globs)).match if globs else None
+    decisions = {}
 
-            # Extract parameters from each URL
-            row_params = []
-            param_names = []
+    def accept(name):
+        decision = decisions.get(name)
+        if decision is None:
+            decision = name in exact or (match is not None and match(name) is not None)
+            if len(decisions) < URL_CACHE_SIZE:
+                decisions[name] = decision
+        return decision
 
-            for row in rows:
-                params = extract_query_params(row.get(url_column, ''))
-                row_params.append(params)
+    return accept
 
-                # Collect unique parameter names
-                for key in params.keys():
-                    if key not in param_names:
-                        param_names.append(key)
 
-            if not param_names:
-                print(f"No URL parameters found in {csv_path}. Skipping.")
+def expand_nested_params(params, depth):
+    """
+    Adds the parameters of URLs nested in parameter values, prefixed with the outer name.
+
+    Tracking links often carry the landing URL in a parameter such as
+    redirect=https%3A%2F%2Fshop.example.com%2F%3Futm_source%3Dx, which becomes
+    redirect.utm_source=x. Nested names follow their outer parameter.
+
+    Args:
+        params: Dictionary of parameter names to lists of values
+        depth: Number of nested levels to expand; 0 returns params unchanged
+
+    Returns:
+        Dictionary of parameter names to lists of values
+    """
+    if depth < 1:
+        return params
+    expanded = {}
+    for name, values in params.items():
+        # A literal outer name may collide with a nested one expanded earlier
+        expanded[name] = expanded[name] + values if name in expanded else values
+        for value in values:
+            if NESTED_URL_PATTERN.match(value) is None:
                 continue
+            for inner_name, inner_values in expand_nested_url(value, depth - 1).items():
+                key = name + NESTED_SEPARATOR + inner_name
+                # Copy, since cached expansions are shared
+                expanded.setdefault(key, []).extend(inner_values)
+    return expanded
+
+
+@lru_cache(maxsize=NESTED_CACHE_SIZE)
+def expand_nested_url(url, depth):
+    """
+    Parses a nested URL and expands its own nested URLs; cached, since the same
+    redirect targets recur across many outer URLs.
+
+    Args:
+        url: Nested URL taken from a parameter value
+        depth: Number of further nested levels to expand
+
+    Returns:
+        Dictionary of parameter names to lists of values (read-only)
+    """
+    return expand_nested_params(extract_query_params(url), depth)
 
-            # Ensure we don't duplicate existing headers
-            new_param_headers = [name for name in param_names if name not in original_headers]
-            combined_headers = list(original_headers) + new_param_headers
 
-            # Create temporary file
-            tmp_path = csv_path.with_suffix('.csv.tmp')
+def extract_nested_params(url, depth, accept=None):
+    """
+    Extracts query parameters including those of nested URLs.
+
+    Args:
+        url: URL string to parse
+        depth: Number of nested levels to expand
+        accept: Optional predicate on the final (prefixed) parameter names
+
+    Returns:
+        Dictionary of parameter names to lists of values
+    """
+    params = expand_nested_params(extract_query_params(url), depth)
+    if accept is None:
+        return params
+    return {name: values for name, values in params.items() if accept(name)}
 
-            # Write processed data to temporary file
-            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=combined_headers)
-                writer.writeheader()
 
-                for i, row in enumerate(rows):
-                    params = row_params[i]
+def configure_url_parser(cache_size, param_patterns=None, nested_depth=0):
+    """
+    Sets up parse_url_params, the URL parser used on the hot path, for this process.
 
-                    # Add parameter values to row
-                    for header in new_param_headers:
-                        values = params.get(header, [])
-                        # Join multiple values with '|'
-                        row[header] = '|'.join(values) if values else ''
+    Tracking exports repeat the same URLs many times, so parsed parameters are
+    memoized per URL. The cache is bounded to cache_size entries, evicting the
+    least recently used URL. Cached dictionaries are shared between rows and
+    must be treated as read-only.
 
-                    writer.writerow(row)
+    Args:
+        cache_size: Maximum number of cached URLs; 0 disables caching
+        param_patterns: Optional list of parameter names or globs to extract;
+            other parameters are skipped while parsing
+        nested_depth: Number of levels of nested URLs to expand (see
+            expand_nested_params). param_patterns then select among the
+            prefixed names, so outer parameters are no longer skipped early.
+    """
+    global parse_url_params
+    parser = extract_query_params
+    accept = make_param_filter(param_patterns) if param_patterns else None
+    if nested_depth > 0:
+        parser = partial(extract_nested_params, depth=nested_depth, accept=accept)
+    elif accept is not None:
+        parser = partial(extract_query_params, accept=accept)
+    if cache_size > 0:
+        parser = lru_cache(maxsize=cache_size)(parser)
+    parse_url_params = parser
 
-            # Replace original file with processed version
-            shutil.move(str(tmp_path), str(csv_path))
 
-            print(f"Successfully processed {csv_path}. Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}")
+def url_cache_counters():
+    """
+    Returns the URL cache counters of this process.
 
-        except Exception as e:
-            print(f"Error processing {csv_path}: {e}")
+    Returns:
+        Tuple of (hits, misses); (0, 0) when caching is disabled
+    """
+    cache_info = getattr(parse_url_params, 'cache_info', None)
+    if cache_info is None:
+        return 0, 0
+    info = cache_info()
+    return info.hits, info.misses
 
 
-def main():
-    """Main execution."""
-    # Allow command line arguments for specific files
-    specific_files = sys.argv[1:] if len(sys.argv) > 1 else None
-    process_csv_files(specific_files)
+def url_cache_counters_since(start):
+    """
+    Returns the URL cache hits and misses recorded since start.
+
+    Args:
+        start: Tuple of (hits, misses) from url_cache_counters
+
+    Returns:
+        Tuple of (hits, misses)
+    """
+    hits, misses = url_cache_counters()
+    return hits - start[0], misses - start[1]
+
+
+# Parser used on the hot path; replaced by configure_url_parser
+parse_url_params = extract_query_params
+
+
+def detect_compression(path):
+    """
+    Detects the compression of a file from its magic bytes or, failing that, its suffix.
+
+    Args:
+        path: Path of the file
+
+    Returns:
+        'gzip', 'zstd' or None for an uncompressed file
+    """
+    try:
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+    except OSError:
+        magic = b''
+
+    for prefix, compression in COMPRESSION_MAGIC.items():
+        if magic.startswith(prefix):
+            return compression
+    if magic:
+        return None
+    return COMPRESSION_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def open_csv(path, mode, compression=None):
+    """
+    Opens a CSV file as a UTF-8 text stream, compressing or decompressing on the fly.
+
+    zstd support requires the zstandard package (pip install zstandard).
+
+    Args:
+        path: Path of the file
+        mode: 'r' or 'w'
+        compression: 'gzip', 'zstd' or None
+
+    Returns:
+        Text file object suitable for the csv module
+    """
+    if compression == 'gzip':
+        # Level 6 is gzip's own default and much faster to write than 9
+        return gzip.open(path, mode + 't', compresslevel=6, encoding='utf-8', newline='')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstandard is required for .zst files. Install it with: pip install zstandard")
+        if mode == 'r':
+            # Read across frames so multi-frame files (e.g. from pzstd) are read completely
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+            return io.TextIOWrapper(reader, encoding='utf-8', newline='')
+        return zstandard.open(path, mode, encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def strip_compression_suffix(path):
+    """
+    Returns path without a trailing compression suffix (data.csv.gz -> data.csv).
+
+    Args:
+        path: Path of the file
+
+    Returns:
+        Path
+    """
+    if path.suffix.lower() in COMPRESSION_SUFFIXES:
+        return path.with_suffix('')
+    return path
+
+
+def find_url_column(headers):
+    """
+    Finds the URL column (case insensitive).
+
+    Args:
+        headers: List of CSV header names
+
+    Returns:
+        Name of the URL column, or None if there is none
+    """
+    for col in headers:
+        if col.lower() == 'url':
+            return col
+    return None
+
+
+def url_column_index(headers, url_column):
+    """
+    Finds the position of the URL column in a header row.
+
+    When the name repeats, the last column wins, as it does for the rows of
+    csv.DictReader, so index-based and dictionary-based passes read the same URL.
+
+    Args:
+        headers: List of CSV header names
+        url_column: Name of the URL column (see find_url_column)
+
+    Returns:
+        Index into the header row
+    """
+    return len(headers) - 1 - headers[::-1].index(url_column)
+
+
+def collect_param_names(params, param_counts):
+    """
+    Counts the parameter names of one URL.
+
+    param_counts is an insertion-ordered dictionary, so names keep first-seen
+    order and lookups stay O(1) however many distinct names a file has.
+
+    Args:
+        params: Dictionary of {param_name: [values]} for one URL
+        param_counts: Dictionary of {param_name: number of rows} discovered so far
+    """
+    for key in params:
+        param_counts[key] = param_counts.get(key, 0) + 1
+
+
+def merge_param_counts(param_counts, other_counts):
+    """
+    Adds other_counts into param_counts, appending names not seen before.
+
+    Args:
+        param_counts: Dictionary of {param_name: number of rows} to update
+        other_counts: Dictionary of {param_name: number of rows} to merge in
+    """
+    for key, count in other_counts.items():
+        param_counts[key] = param_counts.get(key, 0) + count
+
+
+def plan_param_columns(original_headers, param_counts, max_params=None):
+    """
+    Decides which parameters get a column of their own.
+
+    Parameters already present as headers are never duplicated. With
+    max_params, only the max_params most frequent new parameters get columns
+    (ties go to the name seen first); the long tail is grouped into
+    OVERFLOW_COLUMN as an encoded query string. A file that already has an
+    OVERFLOW_COLUMN header or parameter is refused rather than overwritten.
+
+    Args:
+        original_headers: Header names of the input file
+        param_counts: Dictionary of {param_name: number of rows} in first-seen order
+        max_params: Maximum number of parameter columns, or None for no limit
+
+    Returns:
+        Tuple of (new_param_headers, overflow_names)
+
+    Raises:
+        ValueError: If parameters would overflow into an existing OVERFLOW_COLUMN
+    """
+    existing = set(original_headers)
+    new_param_headers = [name for name in param_counts if name not in existing]
+    overflow_names = set()
+
+    if max_params is not None and len(new_param_headers) > max_params:
+        by_frequency = sorted(new_param_headers, key=lambda name: -param_counts[name])
+        if OVERFLOW_COLUMN in existing or OVERFLOW_COLUMN in param_counts:
+            raise ValueError(f"'{OVERFLOW_COLUMN}' is already a column or parameter; --max-params would overwrite it")
+        overflow_names = set(by_frequency[max_params:])
+        new_param_headers = [name for name in new_param_headers if name not in overflow_names]
+        new_param_headers.append(OVERFLOW_COLUMN)
+
+    return new_param_headers, overflow_names
+
+
+def add_param_columns(row, params, param_columns, overflow_names=None):
+    """
+    Fills parameter columns of a row in place.
+
+    Only the row's own parameters are set; the writer fills the remaining
+    parameter columns with '', so the cost per row does not grow with the
+    number of columns.
+
+    Args:
+        row: CSV row dictionary
+        params: Dictionary of {param_name: [values]} for the row's URL
+        param_columns: Set of parameter column names to fill
+        overflow_names: Set of parameter names grouped into OVERFLOW_COLUMN, or
+            ALL_OTHER_PARAMS to group every parameter without a column
+    """
+    overflow = []
+    for name, values in params.items():
+        if name in param_columns:
+            # Join multiple values with '|'
+            row[name] = '|'.join(values)
+        elif overflow_names is ALL_OTHER_PARAMS or (overflow_names and name in overflow_names):
+            overflow.extend((name, value) for value in values)
+
+    if overflow_names:
+        row[OVERFLOW_COLUMN] = urlencode(overflow)
+
+
+def file_result(csv_path, status, message, columns=()):
+    """
+    Builds the report for one processed file.
+
+    Args:
+        csv_path: Path of the CSV file
+        status: One of 'processed', 'skipped' or 'error'
+        message: Human readable outcome
+        columns: Parameter columns added to the file
+
+    Returns:
+        Dictionary describing the outcome
+    """
+    return {
+        'path': str(csv_path),
+        'status': status,
+        'message': message,
+        'columns': list(columns),
+        'cache_hits': 0,
+        'cache_misses': 0,
+    }
+
+
+def discover_param_names(csv_path, compression=None):
+    """
+    First streaming pass: learns the headers and parameter names of a CSV file.
+
+    Only the URL column is parsed and no rows are kept, so memory stays flat
+    regardless of file size.
+
+    Args:
+        csv_path: Path of the CSV file
+        compression: Compression of the file (see detect_compression)
+
+    Returns:
+        Tuple of (headers, url_column, param_counts)
+    """
+    with open_csv(csv_path, 'r', compression) as f:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        if not headers:
+            return None, None, {}
+
+        url_column = find_url_column(headers)
+        if not url_column:
+            return headers, None, {}
+
+        url_index = url_column_index(headers, url_column)
+        param_counts = {}
+        for record in reader:
+            if len(record) > url_index:
+                collect_param_names(parse_url_params(record[url_index]), param_counts)
+
+    return headers, url_column, param_counts
+
+
+def process_csv_file(csv_path, max_params=None, stats=NO_STATS):
+    """
+    Process one CSV file in memory and extract URL parameters.
+
+    Rows are held as tuples rather than dictionaries, and their parameters in a
+    dictionary-encoded ParamTable, so repeated names and values are stored once.
+
+    Args:
+        csv_path: Path of the CSV file
+        max_params: Maximum number of parameter columns (see plan_param_columns)
+        stats: RunStats receiving the read, parse, plan, write and rename times
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    compression = detect_compression(csv_path)
+
+    # Read CSV file
+    with stats.stage('read'), open_csv(csv_path, 'r', compression) as f:
+        reader = csv.DictReader(f)
+        original_headers = reader.fieldnames
+        rows = [tuple(row.values()) for row in reader]
+    stats.rows = len(rows)
+
+    if not original_headers:
+        return file_result(csv_path, 'skipped', f"Warning: No headers found in {csv_path}. Skipping.")
+
+    url_column = find_url_column(original_headers)
+    if not url_column:
+        return file_result(csv_path, 'skipped', f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
+
+    # Keys of the rows as DictReader built them: duplicate headers collapse, and
+    # extra fields of long rows follow under None
+    row_keys = list(dict.fromkeys(original_headers))
+    url_index = row_keys.index(url_column)
+
+    # Extract parameters from each URL
+    row_params = ParamTable()
+    param_counts = {}
+
+    with stats.stage('parse'):
+        for row in rows:
+            params = parse_url_params(row[url_index] or '')
+            row_params.append(params)
+
+            # Collect unique parameter names
+            collect_param_names(params, param_counts)
+
+    if not param_counts:
+        return file_result(csv_path, 'skipped', f"No URL parameters found in {csv_path}. Skipping.")
+
+    with stats.stage('plan'):
+        new_param_headers, overflow_names = plan_param_columns(original_headers, param_counts, max_params)
+        param_columns = set(new_param_headers)
+        combined_headers = list(original_headers) + new_param_headers
+
+    # Create temporary file, compressed like the input
+    tmp_path = csv_path.with_name(csv_path.name + '.tmp')
+
+    # Write processed data to temporary file
+    with stats.stage('write'), open_csv(tmp_path, 'w', compression) as f:
+        writer = csv.DictWriter(f, fieldnames=combined_headers)
+        writer.writeheader()
+
+        long_row_keys = row_keys + [None]
+        for i, values in enumerate(rows):
+            row = dict(zip(row_keys if len(values) == len(row_keys) else long_row_keys, values))
+            add_param_columns(row, row_params[i], param_columns, overflow_names)
+            writer.writerow(row)
+    stats.bytes_written = tmp_path.stat().st_size
+
+    # Replace original file with processed version
+    with stats.stage('rename'):
+        shutil.move(str(tmp_path), str(csv_path))
+
+    return file_result(
+        csv_path,
+        'processed',
+        f"Successfully processed {csv_path}. Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}",
+        new_param_headers,
+    )
+
+
+def write_enriched_rows(reader, writer, url_column, param_columns, overflow_names, buffer_rows=STREAM_BUFFER_ROWS,
+                        stats=NO_STATS):
+    """
+    Reads, enriches and writes rows in batches of buffer_rows.
+
+    Args:
+        reader: csv.DictReader over the input rows
+        writer: Object with a writerows method (csv.DictWriter or ColumnarWriter)
+        url_column: Name of the URL column
+        param_columns: Set of parameter column names to fill
+        overflow_names: Set of parameter names grouped into OVERFLOW_COLUMN
+        buffer_rows: Number of enriched rows written per batch
+        stats: RunStats receiving the parse and write times; the rest of the
+            loop is counted as read
+
+    Returns:
+        Number of rows written
+    """
+    parse = stats.timed('parse', parse_url_params)
+    writerows = stats.timed('write', writer.writerows)
+    buffer = []
+    count = 0
+    with stats.stage('read', exclude=('parse', 'write')):
+        for row in reader:
+            params = parse(row.get(url_column, ''))
+            add_param_columns(row, params, param_columns, overflow_names)
+            buffer.append(row)
+            if len(buffer) >= buffer_rows:
+                writerows(buffer)
+                count += len(buffer)
+                buffer.clear()
+        writerows(buffer)
+    return count + len(buffer)
+
+
+def process_csv_file_streaming(csv_path, max_params=None, output_format='csv', buffer_rows=STREAM_BUFFER_ROWS,
+                               stats=NO_STATS):
+    """
+    Process one CSV file in two streaming passes and extract URL parameters.
+
+    The first pass learns the parameter columns; the second reads, enriches and
+    writes rows one at a time, so peak memory is bounded by buffer_rows rather
+    than by the size of the file.
+
+    With a columnar output_format the CSV is left unchanged and the original
+    plus parameter columns are written next to it as Parquet (.parquet) or an
+    Arrow IPC stream (.arrows) in row groups.
+
+    Args:
+        csv_path: Path of the CSV file
+        max_params: Maximum number of parameter columns (see plan_param_columns)
+        output_format: One of OUTPUT_FORMATS
+        buffer_rows: Number of enriched rows written per batch
+        stats: RunStats receiving the discover, plan, read, parse, write and rename times
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    compression = detect_compression(csv_path)
+    with stats.stage('discover'):
+        original_headers, url_column, param_counts = discover_param_names(csv_path, compression)
+
+    if not original_headers:
+        return file_result(csv_path, 'skipped', f"Warning: No headers found in {csv_path}. Skipping.")
+
+    if not url_column:
+        return file_result(csv_path, 'skipped', f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
+
+    if not param_counts:
+        return file_result(csv_path, 'skipped', f"No URL parameters found in {csv_path}. Skipping.")
+
+    with stats.stage('plan'):
+        new_param_headers, overflow_names = plan_param_columns(original_headers, param_counts, max_params)
+        param_columns = set(new_param_headers)
+        combined_headers = list(original_headers) + new_param_headers
+
+    if output_format != 'csv':
+        from columnar_writer import COLUMNAR_FORMATS, ColumnarWriter
+
+        output_path = strip_compression_suffix(csv_path).with_suffix(COLUMNAR_FORMATS[output_format])
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+
+        with open_csv(csv_path, 'r', compression) as src, \
+                ColumnarWriter(tmp_path, combined_headers, output_format) as writer:
+            reader = csv.DictReader(src)
+            stats.rows = write_enriched_rows(reader, writer, url_column, param_columns, overflow_names,
+                                             buffer_rows, stats)
+        stats.bytes_written = tmp_path.stat().st_size
+
+        with stats.stage('rename'):
+            shutil.move(str(tmp_path), str(output_path))
+
+        return file_result(
+            csv_path,
+            'processed',
+            f"Successfully processed {csv_path} into {output_path}. Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}",
+            new_param_headers,
+        )
+
+    # Create temporary file, compressed like the input
+    tmp_path = csv_path.with_name(csv_path.name + '.tmp')
+
+    with open_csv(csv_path, 'r', compression) as src, \
+            open_csv(tmp_path, 'w', compression) as dst:
+        reader = csv.DictReader(src)
+        writer = csv.DictWriter(dst, fieldnames=combined_headers)
+        writer.writeheader()
+        stats.rows = write_enriched_rows(reader, writer, url_column, param_columns, overflow_names,
+                                         buffer_rows, stats)
+    stats.bytes_written = tmp_path.stat().st_size
+
+    # Replace original file with processed version
+    with stats.stage('rename'):
+        shutil.move(str(tmp_path), str(csv_path))
+
+    return file_result(
+        csv_path,
+        'processed',
+        f"Successfully processed {csv_path}. Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}",
+        new_param_headers,
+    )
+
+
+def load_csv_file_sqlite(csv_path, db_path, stats=NO_STATS):
+    """
+    Load one CSV file and its URL parameters into a SQLite database.
+
+    The CSV is left unchanged. Rows go into the csv_rows table and every
+    parameter value into the indexed params table (see sqlite_writer.py), in
+    one transaction per file. Rows are handed to the writer one at a time;
+    it batches the inserts.
+
+    Args:
+        csv_path: Path of the CSV file
+        db_path: Path of the SQLite database; created if missing
+        stats: RunStats receiving the read, parse and write times
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    from sqlite_writer import SQLiteWriter
+
+    compression = detect_compression(csv_path)
+    with open_csv(csv_path, 'r', compression) as src:
+        reader = csv.reader(src)
+        headers = next(reader, None)
+
+        if not headers:
+            return file_result(csv_path, 'skipped', f"Warning: No headers found in {csv_path}. Skipping.")
+
+        url_column = find_url_column(headers)
+        if not url_column:
+            return file_result(csv_path, 'skipped', f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
+
+        url_index = url_column_index(headers, url_column)
+        param_counts = {}
+        parse = stats.timed('parse', parse_url_params)
+        with SQLiteWriter(db_path, csv_path.resolve(), headers, url_column) as writer, \
+                stats.stage('read', exclude=('parse', 'write')):
+            writerow = stats.timed('write', writer.writerow)
+            for record in reader:
+                params = parse(record[url_index]) if len(record) > url_index else {}
+                collect_param_names(params, param_counts)
+                writerow(record, params)
+            row_count = stats.rows = writer.rows_written
+
+    param_names = list(param_counts)
+    return file_result(
+        csv_path,
+        'processed',
+        f"Loaded {row_count} rows of {csv_path} into {db_path} with {len(param_names)} parameters: {', '.join(param_names)}",
+        param_names,
+    )
+
+
+def find_record_boundaries(csv_path, offsets, block_size=SCAN_BLOCK_BYTES):
+    """
+    Finds the start of the first record that begins after each byte offset.
+
+    The file is scanned once while tracking whether the position is inside a
+    quoted field, so newlines embedded in quoted values are never mistaken for
+    record boundaries. Doubled quotes ("") toggle the state twice and cancel out.
+
+    Args:
+        csv_path: Path of the CSV file
+        offsets: Ascending byte offsets to align
+        block_size: Number of bytes read per scan step
+
+    Returns:
+        List of aligned byte offsets (ascending, without duplicates). Offsets
+        with no newline-terminated record after them are dropped, so the end
+        of the file may itself be returned as a boundary.
+    """
+    boundaries = []
+    pending = list(offsets)
+    in_quotes = False
+    position = 0
+
+    with open(csv_path, 'rb') as f:
+        while pending:
+            block = f.read(block_size)
+            if not block:
+                break
+
+            offset = 0
+            while pending:
+                target = max(pending[0] - position, offset)
+                if target >= len(block):
+                    break
+
+                in_quotes ^= block.count(b'"', offset, target) % 2 == 1
+                offset = target
+
+                boundary = None
+                while True:
+                    newline = block.find(b'\n', offset)
+                    if newline == -1:
+                        break
+                    in_quotes ^= block.count(b'"', offset, newline) % 2 == 1
+                    offset = newline + 1
+                    if not in_quotes:
+                        boundary = position + offset
+                        break
+
+                if boundary is None:
+                    # The record continues into the next block
+                    break
+
+                boundaries.append(boundary)
+                while pending and pending[0] < boundary:
+                    pending.pop(0)
+
+            in_quotes ^= block.count(b'"', offset) % 2 == 1
+            position += len(block)
+
+    return boundaries
+
+
+def read_header(csv_path):
+    """
+    Reads the header record of a CSV file.
+
+    Args:
+        csv_path: Path of the CSV file
+
+    Returns:
+        Tuple of (headers, data_start) where data_start is the byte offset of
+        the first data record
+    """
+    boundaries = find_record_boundaries(csv_path, [0])
+    data_start = boundaries[0] if boundaries else os.path.getsize(csv_path)
+
+    with open(csv_path, 'rb') as f:
+        header_text = f.read(data_start).decode('utf-8')
+
+    headers = next(csv.reader(io.StringIO(header_text, newline='')), None)
+    return headers, data_start
+
+
+def read_chunk_rows(csv_path, start, end, headers):
+    """
+    Reads the rows of one byte-range chunk.
+
+    Args:
+        csv_path: Path of the CSV file
+        start: Byte offset of the first record in the chunk
+        end: Byte offset just past the last record in the chunk
+        headers: CSV header names
+
+    Returns:
+        csv.DictReader over the chunk's rows
+    """
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    return csv.DictReader(io.StringIO(text, newline=''), fieldnames=headers)
+
+
+def discover_chunk_param_names(csv_path, start, end, headers, url_column):
+    """
+    Worker task: counts the parameter names used in one chunk, in first-seen order.
+
+    Returns:
+        Tuple of (param_counts, (cache_hits, cache_misses))
+    """
+    cache_start = url_cache_counters()
+    param_counts = {}
+    for row in read_chunk_rows(csv_path, start, end, headers):
+        collect_param_names(parse_url_params(row.get(url_column, '')), param_counts)
+    return param_counts, url_cache_counters_since(cache_start)
+
+
+def write_chunk(csv_path, start, end, headers, url_column, combined_headers, overflow_names, part_path):
+    """
+    Worker task: writes the enriched rows of one chunk (without a header) to part_path.
+
+    Returns:
+        Tuple of (rows, (cache_hits, cache_misses))
+    """
+    cache_start = url_cache_counters()
+    param_columns = set(combined_headers[len(headers):])
+    rows = 0
+    with open(part_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=combined_headers)
+        for row in read_chunk_rows(csv_path, start, end, headers):
+            params = parse_url_params(row.get(url_column, ''))
+            add_param_columns(row, params, param_columns, overflow_names)
+            writer.writerow(row)
+            rows += 1
+    return rows, url_cache_counters_since(cache_start)
+
+
+def process_csv_file_chunked(csv_path, executor, chunk_bytes, max_params=None, stats=NO_STATS):
+    """
+    Process one large CSV file by parsing byte-range chunks in a worker pool.
+
+    The file is split into chunks of about chunk_bytes aligned on record
+    boundaries. Workers first report the parameter names found in their chunk,
+    which are merged in chunk order (giving the same columns as a serial run),
+    then each writes its enriched rows to a part file. The parts are stitched
+    together in original row order behind a single header.
+
+    Args:
+        csv_path: Path of the CSV file
+        executor: Executor running the chunk tasks
+        chunk_bytes: Target chunk size in bytes
+        max_params: Maximum number of parameter columns (see plan_param_columns)
+        stats: RunStats receiving the row count, bytes written and the discover,
+            plan, write and rename times; reading and parsing happen in the
+            workers and are part of discover and write
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    original_headers, data_start = read_header(csv_path)
+
+    if not original_headers:
+        return file_result(csv_path, 'skipped', f"Warning: No headers found in {csv_path}. Skipping.")
+
+    url_column = find_url_column(original_headers)
+    if not url_column:
+        return file_result(csv_path, 'skipped', f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
+
+    file_size = os.path.getsize(csv_path)
+    targets = list(range(data_start + chunk_bytes, file_size, chunk_bytes))
+    boundaries = [data_start] + find_record_boundaries(csv_path, targets)
+    if boundaries[-1] < file_size:
+        boundaries.append(file_size)
+    chunks = list(zip(boundaries[:-1], boundaries[1:]))
+    count = len(chunks)
+
+    param_counts = {}
+    cache_hits = cache_misses = 0
+    with stats.stage('discover'):
+        chunk_counts = executor.map(
+            discover_chunk_param_names,
+            [csv_path] * count,
+            [start for start, _ in chunks],
+            [end for _, end in chunks],
+            [original_headers] * count,
+            [url_column] * count,
+        )
+        for counts, (hits, misses) in chunk_counts:
+            cache_hits += hits
+            cache_misses += misses
+            merge_param_counts(param_counts, counts)
+
+    if not param_counts:
+        return file_result(csv_path, 'skipped', f"No URL parameters found in {csv_path}. Skipping.")
+
+    with stats.stage('plan'):
+        new_param_headers, overflow_names = plan_param_columns(original_headers, param_counts, max_params)
+        combined_headers = list(original_headers) + new_param_headers
+
+    # Create temporary file
+    tmp_path = csv_path.with_suffix('.csv.tmp')
+    part_paths = [csv_path.with_suffix(f'.csv.part{i}') for i in range(count)]
+
+    with stats.stage('write'):
+        try:
+            chunk_cache_counts = executor.map(
+                write_chunk,
+                [csv_path] * count,
+                [start for start, _ in chunks],
+                [end for _, end in chunks],
+                [original_headers] * count,
+                [url_column] * count,
+                [combined_headers] * count,
+                [overflow_names] * count,
+                part_paths,
+            )
+            rows = 0
+            for chunk_rows, (hits, misses) in chunk_cache_counts:
+                rows += chunk_rows
+                cache_hits += hits
+                cache_misses += misses
+
+            # Stitch the header and the parts together in original row order
+            header = io.StringIO(newline='')
+            csv.DictWriter(header, fieldnames=combined_headers).writeheader()
+            with open(tmp_path, 'wb') as dst:
+                dst.write(header.getvalue().encode('utf-8'))
+                for part_path in part_paths:
+                    with open(part_path, 'rb') as src:
+                        shutil.copyfileobj(src, dst)
+        finally:
+            for part_path in part_paths:
+                if part_path.exists():
+                    part_path.unlink()
+    stats.rows = rows
+    stats.bytes_written = tmp_path.stat().st_size
+
+    # Replace original file with processed version
+    with stats.stage('rename'):
+        shutil.move(str(tmp_path), str(csv_path))
+
+    result = file_result(
+        csv_path,
+        'processed',
+        f"Successfully processed {csv_path} in {count} chunks. Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}",
+        new_param_headers,
+    )
+    result['cache_hits'] = cache_hits
+    result['cache_misses'] = cache_misses
+    return result
+
+
+def find_last_record_end(csv_path, start, block_size=SCAN_BLOCK_BYTES):
+    """
+    Finds the end of the last complete record at or after start.
+
+    A record is complete once its terminating newline (outside quotes) has been
+    written, so a row still being appended by another process is left for the
+    next run.
+
+    Args:
+        csv_path: Path of the CSV file
+        start: Byte offset of a record boundary
+        block_size: Number of bytes read per scan step
+
+    Returns:
+        Byte offset just past the last complete record, or start if there is none
+    """
+    last_end = start
+    in_quotes = False
+    position = start
+
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+
+            # Walk back from the last newline until one lies outside quotes
+            newline = block.rfind(b'\n')
+            while newline != -1:
+                if not in_quotes ^ (block.count(b'"', 0, newline) % 2 == 1):
+                    last_end = position + newline + 1
+                    break
+                newline = block.rfind(b'\n', 0, newline)
+
+            in_quotes ^= block.count(b'"') % 2 == 1
+            position += len(block)
+
+    return last_end
+
+
+def iter_record_lines(csv_path, start, end):
+    """
+    Yields the decoded lines of a byte range without loading it whole.
+
+    Args:
+        csv_path: Path of the CSV file
+        start: Byte offset of the first record
+        end: Byte offset just past the last record
+
+    Yields:
+        Lines including their line terminators, for csv.reader
+    """
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        for line in f:
+            if remaining <= 0:
+                break
+            if len(line) > remaining:
+                line = line[:remaining]
+            remaining -= len(line)
+            yield line.decode('utf-8')
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Loads a sidecar checkpoint.
+
+    Args:
+        checkpoint_path: Path of the checkpoint file
+
+    Returns:
+        Checkpoint dictionary, or None if it is missing or unreadable
+    """
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """
+    Writes a sidecar checkpoint atomically.
+
+    Args:
+        checkpoint_path: Path of the checkpoint file
+        checkpoint: Checkpoint dictionary
+    """
+    tmp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def process_csv_file_incremental(csv_path, stats=NO_STATS):
+    """
+    Process only the rows appended to a CSV file since the last run.
+
+    The input is treated as an append-only log and left unchanged. Enriched
+    rows go to <name>.enriched.csv, and <name>.csv.checkpoint.json records the
+    input byte offset already processed, the parameter columns and the size of
+    the output. New rows are appended to the output; the output is only
+    rewritten when a new parameter name appears and the header has to grow.
+    If the input was truncated or its header changed, everything is rebuilt.
+
+    Args:
+        csv_path: Path of the CSV file
+        stats: RunStats receiving the new row count, bytes written and the
+            discover, read, parse, write and rename times
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    output_path = csv_path.with_name(csv_path.stem + ENRICHED_SUFFIX)
+    checkpoint_path = csv_path.with_name(csv_path.name + CHECKPOINT_SUFFIX)
+
+    original_headers, data_start = read_header(csv_path)
+    if not original_headers:
+        return file_result(csv_path, 'skipped', f"Warning: No headers found in {csv_path}. Skipping.")
+
+    url_column = find_url_column(original_headers)
+    if not url_column:
+        return file_result(csv_path, 'skipped', f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    rebuild = (
+        checkpoint is None
+        or checkpoint.get('headers') != original_headers
+        or checkpoint.get('offset', 0) > os.path.getsize(csv_path)
+        or not output_path.exists()
+        or os.path.getsize(output_path) < checkpoint.get('output_size', 0)
+    )
+    if rebuild:
+        checkpoint = {'headers': original_headers, 'offset': data_start, 'param_columns': [], 'rows': 0}
+
+    start = checkpoint['offset']
+    end = find_last_record_end(csv_path, start)
+    if end == start and not rebuild:
+        return file_result(csv_path, 'skipped', f"No new rows in {csv_path}. Skipping.")
+
+    # First pass over the new rows: look for parameter names without a column yet
+    param_counts = {}
+    with stats.stage('discover'):
+        for row in csv.DictReader(iter_record_lines(csv_path, start, end), fieldnames=original_headers):
+            collect_param_names(parse_url_params(row.get(url_column, '')), param_counts)
+
+    known = set(original_headers) | set(checkpoint['param_columns'])
+    new_param_headers = [name for name in param_counts if name not in known]
+    param_columns = checkpoint['param_columns'] + new_param_headers
+    combined_headers = list(original_headers) + param_columns
+    new_rows = csv.DictReader(iter_record_lines(csv_path, start, end), fieldnames=original_headers)
+
+    if rebuild or new_param_headers:
+        # The header grows: copy the rows enriched so far under the new header
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as dst:
+            writer = csv.DictWriter(dst, fieldnames=combined_headers)
+            writer.writeheader()
+            if not rebuild:
+                with stats.stage('write'), open(output_path, 'r', encoding='utf-8', newline='') as src:
+                    writer.writerows(csv.DictReader(src))
+            count = write_enriched_rows(new_rows, writer, url_column, set(param_columns), None, stats=stats)
+        stats.bytes_written = tmp_path.stat().st_size
+        with stats.stage('rename'):
+            shutil.move(str(tmp_path), str(output_path))
+    else:
+        with open(output_path, 'r+', encoding='utf-8', newline='') as dst:
+            # Drop anything written after the last checkpoint by an interrupted run
+            dst.truncate(checkpoint['output_size'])
+            dst.seek(0, os.SEEK_END)
+            writer = csv.DictWriter(dst, fieldnames=combined_headers)
+            count = write_enriched_rows(new_rows, writer, url_column, set(param_columns), None, stats=stats)
+        stats.bytes_written = os.path.getsize(output_path) - checkpoint['output_size']
+    stats.rows = count
+
+    checkpoint.update({
+        'offset': end,
+        'param_columns': param_columns,
+        'rows': checkpoint['rows'] + count,
+        'output_size': os.path.getsize(output_path),
+    })
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    header_note = f" Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}" if new_param_headers else ""
+    return file_result(
+        csv_path,
+        'processed',
+        f"Successfully processed {count} new rows of {csv_path} into {output_path}.{header_note}",
+        new_param_headers,
+    )
+
+
+class RecordLines:
+    """
+    Iterates over the decoded lines of a file from a byte offset, tracking how
+    many bytes have been consumed.
+
+    csv.reader pulls lines only until a record is complete, so after each row
+    it yields, offset is the byte position just past that row.
+    """
+
+    def __init__(self, f, start):
+        f.seek(start)
+        self.lines = iter(f)
+        self.offset = start
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.lines)
+        self.offset += len(line)
+        return line.decode('utf-8')
+
+
+def file_fingerprint(csv_path, headers):
+    """
+    Identifies the version of a file a checkpoint was written for.
+
+    Args:
+        csv_path: Path of the CSV file
+        headers: Header names of the file
+
+    Returns:
+        JSON-serializable dictionary
+    """
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'headers': headers}
+
+
+def process_csv_file_resumable(csv_path, max_params=None, params=None, nested_depth=0,
+                               checkpoint_rows=RESUME_CHECKPOINT_ROWS, stats=NO_STATS):
+    """
+    Process one CSV file in two streaming passes that survive being interrupted.
+
+    Every checkpoint_rows rows, <name>.csv.resume.json records the pass, the
+    input byte offset reached, the parameter names counted so far and, while
+    writing, the columns and the size of the flushed <name>.csv.tmp output.
+    A rerun on the unchanged file with the same settings continues from that
+    checkpoint, dropping anything written after it; if the file or the
+    settings changed, it starts over. The checkpoint is removed once the file
+    has been replaced.
+
+    Args:
+        csv_path: Path of the CSV file
+        max_params: Maximum number of parameter columns (see plan_param_columns)
+        params: Parameter names or globs the URL parser was configured with
+            (see configure_url_parser), or None
+        nested_depth: Nested URL depth the URL parser was configured with
+        checkpoint_rows: Number of rows processed between checkpoints
+        stats: RunStats receiving the rows and bytes written by this run and
+            the discover, plan, read, parse, write and rename times
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    original_headers, data_start = read_header(csv_path)
+    if not original_headers:
+        return file_result(csv_path, 'skipped', f"Warning: No headers found in {csv_path}. Skipping.")
+
+    url_column = find_url_column(original_headers)
+    if not url_column:
+        return file_result(csv_path, 'skipped', f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
+
+    checkpoint_path = csv_path.with_name(csv_path.name + RESUME_SUFFIX)
+    tmp_path = csv_path.with_name(csv_path.name + '.tmp')
+    fingerprint = file_fingerprint(csv_path, original_headers)
+    # The columns depend on these as much as on the file, so a change starts over
+    settings = {'max_params': max_params, 'params': list(params) if params else None, 'nested_depth': nested_depth}
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    resumed_from = None
+    if (checkpoint is None
+            or checkpoint.get('fingerprint') != fingerprint
+            or checkpoint.get('settings') != settings
+            or (checkpoint.get('phase') == 'write'
+                and (not tmp_path.exists() or os.path.getsize(tmp_path) < checkpoint['output_size']))):
+        checkpoint = {
+            'fingerprint': fingerprint,
+            'settings': settings,
+            'phase': 'discover',
+            'offset': data_start,
+            'rows': 0,
+            'param_counts': {},
+        }
+    elif checkpoint['rows'] or checkpoint['phase'] == 'write':
+        resumed_from = f" Resumed after {checkpoint['rows']} rows of the {checkpoint['phase']} pass."
+
+    if checkpoint['phase'] == 'discover':
+        param_counts = checkpoint['param_counts']
+        with stats.stage('discover'), open(csv_path, 'rb') as f:
+            lines = RecordLines(f, checkpoint['offset'])
+            reader = csv.DictReader(lines, fieldnames=original_headers)
+            for row in reader:
+                collect_param_names(parse_url_params(row.get(url_column, '')), param_counts)
+                checkpoint['rows'] += 1
+                if checkpoint['rows'] % checkpoint_rows == 0:
+                    checkpoint['offset'] = lines.offset
+                    save_checkpoint(checkpoint_path, checkpoint)
+
+        if not param_counts:
+            checkpoint_path.unlink(missing_ok=True)
+            return file_result(csv_path, 'skipped', f"No URL parameters found in {csv_path}. Skipping.")
+
+        with stats.stage('plan'):
+            new_param_headers, overflow_names = plan_param_columns(original_headers, param_counts, max_params)
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as dst:
+            csv.DictWriter(dst, fieldnames=list(original_headers) + new_param_headers).writeheader()
+        checkpoint.update({
+            'phase': 'write',
+            'offset': data_start,
+            'rows': 0,
+            'param_columns': new_param_headers,
+            'overflow_names': sorted(overflow_names),
+            'output_size': os.path.getsize(tmp_path),
+        })
+        del checkpoint['param_counts']
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    new_param_headers = checkpoint['param_columns']
+    param_columns = set(new_param_headers)
+    overflow_names = set(checkpoint['overflow_names'])
+    combined_headers = list(original_headers) + new_param_headers
+    resume_size = checkpoint['output_size']
+    rows = 0
+
+    with open(csv_path, 'rb') as src, open(tmp_path, 'r+', encoding='utf-8', newline='') as dst:
+        # Drop anything written after the last checkpoint by an interrupted run
+        dst.truncate(checkpoint['output_size'])
+        dst.seek(0, os.SEEK_END)
+        writer = csv.DictWriter(dst, fieldnames=combined_headers)
+        lines = RecordLines(src, checkpoint['offset'])
+        reader = csv.DictReader(lines, fieldnames=original_headers)
+        while True:
+            count = write_enriched_rows(islice(reader, checkpoint_rows), writer, url_column, param_columns,
+                                        overflow_names, stats=stats)
+            if count == 0:
+                break
+            rows += count
+            with stats.stage('write'):
+                dst.flush()
+                os.fsync(dst.fileno())
+                checkpoint['offset'] = lines.offset
+                checkpoint['rows'] += count
+                checkpoint['output_size'] = os.path.getsize(tmp_path)
+                save_checkpoint(checkpoint_path, checkpoint)
+    stats.rows = rows
+    stats.bytes_written = tmp_path.stat().st_size - resume_size
+
+    # Replace original file with processed version
+    with stats.stage('rename'):
+        shutil.move(str(tmp_path), str(csv_path))
+    checkpoint_path.unlink()
+
+    return file_result(
+        csv_path,
+        'processed',
+        f"Successfully processed {csv_path}.{resumed_from or ''} Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}",
+        new_param_headers,
+    )
+
+
+def process_csv_pipe(src, dst, declared_params=None, max_params=None, lookahead_rows=LOOKAHEAD_ROWS):
+    """
+    Streams enriched rows from one text stream to another in a single pass.
+
+    Used for Unix pipelines (stdin/stdout), where the header has to be written
+    before the whole input has been seen. With declared_params the parameter
+    columns are known up front. Otherwise the first lookahead_rows rows are
+    buffered to choose the columns, and parameters that first appear later are
+    grouped into OVERFLOW_COLUMN.
+
+    Args:
+        src: Text stream of CSV input
+        dst: Text stream receiving the enriched CSV
+        declared_params: List of parameter names to use as columns, or None
+        max_params: Maximum number of parameter columns (see plan_param_columns)
+        lookahead_rows: Number of rows buffered to discover parameter columns
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    name = getattr(src, 'name', '<stdin>')
+    reader = csv.DictReader(src)
+    original_headers = reader.fieldnames
+
+    if not original_headers:
+        return file_result(name, 'skipped', f"Warning: No headers found in {name}. Skipping.")
+
+    url_column = find_url_column(original_headers)
+    if not url_column:
+        return file_result(name, 'error', f"Error: No 'url' or 'URL' column found in {name}.")
+
+    lookahead = []
+    if declared_params:
+        existing = set(original_headers)
+        new_param_headers = [param for param in declared_params if param not in existing]
+        overflow_names = None
+    else:
+        lookahead = list(islice(reader, lookahead_rows))
+        param_counts = {}
+        for row in lookahead:
+            collect_param_names(parse_url_params(row.get(url_column, '')), param_counts)
+        if OVERFLOW_COLUMN in original_headers or OVERFLOW_COLUMN in param_counts:
+            return file_result(name, 'error', f"Error: '{OVERFLOW_COLUMN}' is already a column or parameter in {name}; "
+                                              f"pass --params to choose the columns instead.")
+        new_param_headers, overflow_names = plan_param_columns(original_headers, param_counts, max_params)
+        if OVERFLOW_COLUMN not in new_param_headers:
+            new_param_headers.append(OVERFLOW_COLUMN)
+        overflow_names = ALL_OTHER_PARAMS
+
+    writer = csv.DictWriter(dst, fieldnames=list(original_headers) + new_param_headers)
+    writer.writeheader()
+    count = write_enriched_rows(chain(lookahead, reader), writer, url_column, set(new_param_headers), overflow_names)
+    dst.flush()
+
+    return file_result(
+        name,
+        'processed',
+        f"Successfully processed {count} rows from {name}. Added {len(new_param_headers)} parameter columns: {', '.join(new_param_headers)}",
+        new_param_headers,
+    )
+
+
+def declared_param_names(params):
+    """
+    Returns params if they are all exact names, which pipeline mode uses as
+    the columns directly, or None if any is a glob or none were given.
+    """
+    if params and not any(re.search(r'[*?\[]', param) for param in params):
+        return params
+    return None
+
+
+def run_pipeline(source, cache_size=URL_CACHE_SIZE, max_params=None, params=None, lookahead_rows=LOOKAHEAD_ROWS,
+                 nested_depth=0):
+    """
+    Processes one input ('-' for stdin) and writes the enriched CSV to stdout.
+
+    Progress and reports go to stderr so stdout only carries CSV data.
+
+    Args:
+        source: Path of the input file, or '-' for stdin
+        cache_size: Number of distinct URLs kept in the parse cache; 0 disables it
+        max_params: Maximum number of parameter columns (see plan_param_columns)
+        params: List of parameter names or globs to extract. Exact names are
+            used as pre-declared columns, so no lookahead is needed.
+        lookahead_rows: Number of rows buffered to discover parameter columns
+        nested_depth: Number of levels of nested URLs to expand
+
+    Returns:
+        File result dictionary (see file_result)
+    """
+    configure_url_parser(cache_size, params, nested_depth)
+    declared_params = declared_param_names(params)
+
+    try:
+        if source == '-':
+            src = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        else:
+            src = open_csv(source, 'r', detect_compression(source))
+    except (OSError, RuntimeError) as e:
+        result = file_result(source, 'error', f"Error processing {source}: {e}")
+    else:
+        dst = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='')
+        try:
+            with src:
+                result = process_csv_pipe(src, dst, declared_params, max_params, lookahead_rows)
+        finally:
+            dst.detach()
+
+    print(result['message'], file=sys.stderr)
+    if cache_size > 0:
+        print_cache_report([result], file=sys.stderr)
+    return result
+
+
+def processing_options(stream=False, chunk_bytes=None, max_params=None, output_format='csv', incremental=False,
+                       resumable=False, sqlite_path=None, stats=False, params=None, nested_depth=0):
+    """
+    Builds the options dictionary read by process_one_file.
+
+    Args:
+        stream: Use the constant-memory streaming path
+        chunk_bytes: Chunk size in bytes for chunked processing, or None
+        max_params: Maximum number of parameter columns, or None
+        output_format: One of OUTPUT_FORMATS
+        incremental: Only process rows appended since the last run
+        resumable: Checkpoint progress so interrupted runs resume
+        sqlite_path: Load into this SQLite database instead of rewriting files
+        stats: Attach run statistics to each result
+        params: Parameter names or globs the URL parser was configured with, or None
+        nested_depth: Nested URL depth the URL parser was configured with
+
+    Returns:
+        Options dictionary
+    """
+    return {
+        'stream': stream,
+        'chunk_bytes': chunk_bytes,
+        'max_params': max_params,
+        'output_format': output_format,
+        'incremental': incremental,
+        'resumable': resumable,
+        'sqlite_path': sqlite_path,
+        'stats': stats,
+        'params': params,
+        'nested_depth': nested_depth,
+    }
+
+
+def process_one_file(csv_path, options, executor=None):
+    """
+    Process one CSV file, turning any failure into an error result.
+
+    Runs in worker processes when files are processed in parallel.
+
+    Args:
+        csv_path: Path of the CSV file
+        options: Dictionary of processing options (see processing_options)
+        executor: Worker pool for chunked processing of a single file
+
+    Returns:
+        File result dictionary (see file_result); with options['stats'] it
+        also has a 'stats' entry (see RunStats.report)
+    """
+    max_params = options['max_params']
+    output_format = options['output_format']
+    stats = RunStats() if options['stats'] else NO_STATS
+
+    start = time.perf_counter()
+    cache_start = url_cache_counters()
+    try:
+        bytes_read = os.path.getsize(csv_path) if options['stats'] else None
+        # Byte offsets cannot be mapped into a compressed stream, so compressed
+        # files always go through the streaming or in-memory paths
+        compression = detect_compression(csv_path)
+        if options['sqlite_path']:
+            result = load_csv_file_sqlite(csv_path, options['sqlite_path'], stats=stats)
+        elif options['incremental'] and compression:
+            result = file_result(csv_path, 'skipped', f"Warning: --incremental does not support compressed file {csv_path}. Skipping.")
+        elif options['incremental']:
+            result = process_csv_file_incremental(csv_path, stats)
+        elif options['resumable'] and compression:
+            result = file_result(csv_path, 'skipped', f"Warning: --resumable does not support compressed file {csv_path}. Skipping.")
+        elif options['resumable']:
+            result = process_csv_file_resumable(csv_path, max_params, options['params'], options['nested_depth'],
+                                                stats=stats)
+        elif options['chunk_bytes'] and compression:
+            result = process_csv_file_streaming(csv_path, max_params, output_format, stats=stats)
+        elif options['chunk_bytes']:
+            result = process_csv_file_chunked(csv_path, executor, options['chunk_bytes'], max_params, stats)
+        elif options['stream'] or output_format != 'csv':
+            result = process_csv_file_streaming(csv_path, max_params, output_format, stats=stats)
+        else:
+            result = process_csv_file(csv_path, max_params, stats)
+    except Exception as e:
+        result = file_result(csv_path, 'error', f"Error processing {csv_path}: {e}")
+        bytes_read = None
+
+    hits, misses = url_cache_counters_since(cache_start)
+    result['cache_hits'] += hits
+    result['cache_misses'] += misses
+    if options['stats']:
+        result['stats'] = stats.report(time.perf_counter() - start, bytes_read,
+                                       result['cache_hits'], result['cache_misses'])
+    return result
+
+
+def print_summary(results):
+    """
+    Prints one combined summary for a batch of files.
+
+    Args:
+        results: List of file result dictionaries
+    """
+    counts = {'processed': 0, 'skipped': 0, 'error': 0}
+    columns = set()
+    for result in results:
+        counts[result['status']] += 1
+        columns.update(result['columns'])
+
+    print(
+        f"Summary: {len(results)} files, {counts['processed']} processed, "
+        f"{counts['skipped']} skipped, {counts['error']} failed. "
+        f"{len(columns)} distinct parameter columns added."
+    )
+    for result in results:
+        if result['status'] == 'error':
+            print(f"  Failed: {result['path']}")
+
+
+def print_cache_report(results, file=None):
+    """
+    Prints the URL cache hit and miss counters for a run.
+
+    Args:
+        results: List of file result dictionaries
+        file: Stream to print to (default: stdout)
+    """
+    hits = sum(result['cache_hits'] for result in results)
+    misses = sum(result['cache_misses'] for result in results)
+    lookups = hits + misses
+    if lookups:
+        print(f"URL cache: {hits} hits, {misses} misses ({hits / lookups:.1%} hit rate)", file=file)
+
+
+def format_bytes(size):
+    """Formats a byte count for reports, e.g. 12.3 MB; '-' when unknown."""
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def build_stats_report(results, seconds):
+    """
+    Combines the per-file statistics of a run.
+
+    Args:
+        results: List of file result dictionaries with 'stats' entries
+        seconds: Wall time of the whole run
+
+    Returns:
+        JSON-serializable report with 'files' and 'total' entries
+    """
+    files = []
+    rows = None
+    bytes_read = bytes_written = 0
+    stages = {}
+    for result in results:
+        stats = result.get('stats')
+        if stats is None:
+            continue
+        files.append({'path': result['path'], 'status': result['status'], **stats})
+        if stats['rows'] is not None:
+            rows = (rows or 0) + stats['rows']
+        bytes_read += stats['bytes_read'] or 0
+        bytes_written += stats['bytes_written'] or 0
+        for name, stage_seconds in stats['stages'].items():
+            stages[name] = round(stages.get(name, 0.0) + stage_seconds, 6)
+
+    hits = sum(result['cache_hits'] for result in results)
+    lookups = hits + sum(result['cache_misses'] for result in results)
+    peaks = [peak for peak in (peak_rss_bytes(), peak_rss_bytes(children=True)) if peak]
+    return {
+        'files': files,
+        'total': {
+            'seconds': round(seconds, 6),
+            'stages': stages,
+            'rows': rows,
+            'rows_per_sec': round(rows / seconds, 1) if seconds and rows is not None else None,
+            'bytes_read': bytes_read,
+            'bytes_written': bytes_written,
+            'mb_per_sec': round(bytes_read / 2**20 / seconds, 3) if seconds else None,
+            'cache_hit_rate': round(hits / lookups, 6) if lookups else None,
+            'peak_rss_bytes': max(peaks) if peaks else None,
+        },
+    }
+
+
+def print_stats(report, file=None):
+    """
+    Prints per-file and total timings from build_stats_report.
+
+    Args:
+        report: Report dictionary from build_stats_report
+        file: Stream to print to (default: stdout)
+    """
+    entries = [(entry['path'], entry) for entry in report['files']] + [('Total', report['total'])]
+    for label, entry in entries:
+        stages = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in entry['stages'].items())
+        rate = f"{entry['rows_per_sec']:,.0f} rows/s" if entry['rows_per_sec'] is not None else "- rows/s"
+        hit_rate = f"{entry['cache_hit_rate']:.1%}" if entry['cache_hit_rate'] is not None else '-'
+        print(
+            f"{label}: {entry['seconds']:.2f}s ({stages or 'no stages'}); {rate}; "
+            f"read {format_bytes(entry['bytes_read'])}, wrote {format_bytes(entry['bytes_written'])}; "
+            f"cache hit rate {hit_rate}; peak RSS {format_bytes(entry['peak_rss_bytes'])}",
+            file=file,
+        )
+
+
+def find_csv_files(csv_paths=None):
+    """
+    Resolves the files to process.
+
+    Args:
+        csv_paths: List of CSV file paths. If None or empty, all CSV files in the
+            current directory (CSV_GLOBS) are used, except outputs of
+            incremental mode (ENRICHED_SUFFIX)
+
+    Returns:
+        List of Paths
+    """
+    if csv_paths:
+        return [Path(p) for p in csv_paths]
+
+    csv_files = [path for pattern in CSV_GLOBS for path in sorted(Path('.').glob(pattern))]
+    return [path for path in csv_files if not path.name.endswith(ENRICHED_SUFFIX)]
+
+
+def analyze_csv_file(csv_path):
+    """
+    Summarizes the URL parameters of one CSV file without rewriting it.
+
+    Only the URL column is parsed. Parameters are summarized in bounded-memory
+    sketches (see param_sketches.py), so memory does not grow with the number
+    of rows or distinct parameter names.
+
+    Args:
+        csv_path: Path of the CSV file
+
+    Returns:
+        Tuple of (file result dictionary, ParamAnalyzer or None)
+    """
+    cache_start = url_cache_counters()
+    analyzer = None
+    try:
+        with open_csv(csv_path, 'r', detect_compression(csv_path)) as f:
+            reader = csv.reader(f)
+            headers = next(reader, None)
+            url_column = find_url_column(headers) if headers else None
+            if not headers:
+                result = file_result(csv_path, 'skipped', f"Warning: No headers found in {csv_path}. Skipping.")
+            elif not url_column:
+                result = file_result(csv_path, 'skipped', f"Warning: No 'url' or 'URL' column found in {csv_path}. Skipping.")
+            else:
+                url_index = url_column_index(headers, url_column)
+                analyzer = ParamAnalyzer()
+                for record in reader:
+                    analyzer.add_row(parse_url_params(record[url_index]) if len(record) > url_index else {})
+                result = file_result(
+                    csv_path,
+                    'processed',
+                    f"Analyzed {analyzer.rows} rows of {csv_path}: {analyzer.param_count()} distinct parameters.",
+                )
+    except Exception as e:
+        result = file_result(csv_path, 'error', f"Error processing {csv_path}: {e}")
+        analyzer = None
+
+    hits, misses = url_cache_counters_since(cache_start)
+    result['cache_hits'] += hits
+    result['cache_misses'] += misses
+    return result, analyzer
+
+
+def analyze_csv_files(csv_paths=None, jobs=1, cache_size=URL_CACHE_SIZE, params=None, report_path=None,
+                      nested_depth=0):
+    """
+    Builds one JSON report of parameter fill rates, cardinalities and top values.
+
+    Files are analyzed independently (in parallel with jobs > 1) and their
+    sketches merged. Progress goes to stderr; the report goes to report_path,
+    or to stdout if it is None.
+
+    Args:
+        csv_paths: List of CSV file paths. If None, analyzes all CSV files in current directory.
+        jobs: Number of worker processes
+        cache_size: Number of distinct URLs kept in each process's parse cache; 0 disables it.
+        params: List of parameter names or globs to analyze; None analyzes every parameter.
+        report_path: Path of the JSON report, or None for stdout
+        nested_depth: Number of levels of nested URLs to expand
+
+    Returns:
+        Report dictionary
+    """
+    csv_files = find_csv_files(csv_paths)
+    configure_url_parser(cache_size, params, nested_depth)
+
+    results = []
+    combined = ParamAnalyzer()
+    if jobs > 1 and len(csv_files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=configure_url_parser,
+                                 initargs=(cache_size, params, nested_depth)) as executor:
+            outcomes = list(executor.map(analyze_csv_file, csv_files))
+    else:
+        outcomes = map(analyze_csv_file, csv_files)
+
+    for result, analyzer in outcomes:
+        print(result['message'], file=sys.stderr)
+        results.append(result)
+        if analyzer is not None:
+            combined.merge(analyzer)
+
+    if cache_size > 0:
+        print_cache_report(results, file=sys.stderr)
+
+    report = {'files': [result['path'] for result in results if result['status'] == 'processed']}
+    report.update(combined.report())
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Wrote parameter report for {report['rows']} rows to {report_path}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    return report
+
+
+def process_csv_files(csv_paths=None, stream=False, jobs=1, chunk_size=None, cache_size=URL_CACHE_SIZE,
+                      max_params=None, params=None, output_format='csv', incremental=False, sqlite_path=None,
+                      nested_depth=0, stats=False, stats_path=None, resumable=False):
+    """
+    Process CSV files and extract URL parameters.
+
+    Args:
+        csv_paths: List of CSV file paths. If None, processes all CSV files in current directory.
+        stream: Process files in two constant-memory passes instead of loading them whole.
+        jobs: Number of worker processes; files are spread across them when greater than 1.
+        chunk_size: Chunk size in bytes. When set, files are processed one at a time
+            and each is split into chunks parsed by the worker pool.
+        cache_size: Number of distinct URLs kept in each process's parse cache; 0 disables it.
+        max_params: Maximum number of parameter columns per file; rarer parameters are
+            grouped into the OVERFLOW_COLUMN column. None keeps every parameter.
+        params: List of parameter names or globs (e.g. 'utm_*') to extract. Other
+            parameters are skipped while parsing. None extracts every parameter.
+        output_format: 'csv' rewrites files in place; 'parquet' or 'arrow' write a
+            columnar file next to each CSV instead.
+        incremental: Treat files as append-only logs and only process rows added
+            since the last run (see process_csv_file_incremental).
+        sqlite_path: Load rows and parameters into this SQLite database instead of
+            rewriting the files (see load_csv_file_sqlite). Files are loaded one at a time.
+        nested_depth: Number of levels of URLs nested in parameter values to expand
+            into prefixed columns such as redirect.utm_source; 0 disables it.
+        stats: Print per-file and per-stage timings, throughput, cache hit
+            rates and peak memory at the end of the run.
+        stats_path: Also write those statistics as JSON to this path.
+        resumable: Checkpoint progress so an interrupted run continues where it
+            stopped (see process_csv_file_resumable).
+
+    Returns:
+        List of file result dictionaries, in input order
+    """
+    run_start = time.perf_counter()
+    csv_files = find_csv_files(csv_paths)
+    if not csv_files:
+        print("No CSV files found to process.")
+        return []
+
+    configure_url_parser(cache_size, params, nested_depth)
+    options = processing_options(
+        stream=stream,
+        chunk_bytes=chunk_size,
+        max_params=max_params,
+        output_format=output_format,
+        incremental=incremental,
+        resumable=resumable,
+        sqlite_path=sqlite_path,
+        stats=stats or bool(stats_path),
+        params=params,
+        nested_depth=nested_depth,
+    )
+
+    results = []
+    if chunk_size:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=configure_url_parser,
+                                 initargs=(cache_size, params, nested_depth)) as executor:
+            for csv_path in csv_files:
+                print(f"Processing {csv_path}...")
+                result = process_one_file(csv_path, options, executor)
+                print(result['message'])
+                results.append(result)
+    elif jobs > 1 and len(csv_files) > 1:
+        print(f"Processing {len(csv_files)} files with {jobs} workers...")
+        with ProcessPoolExecutor(max_workers=jobs, initializer=configure_url_parser,
+                                 initargs=(cache_size, params, nested_depth)) as executor:
+            # map yields results in submission order, so reports stay in input order
+            for result in executor.map(process_one_file, csv_files, [options] * len(csv_files)):
+                print(result['message'])
+                results.append(result)
+    else:
+        for csv_path in csv_files:
+            print(f"Processing {csv_path}...")
+            result = process_one_file(csv_path, options)
+            print(result['message'])
+            results.append(result)
+
+    if len(results) > 1:
+        print_summary(results)
+    if cache_size > 0:
+        print_cache_report(results)
+    if options['stats']:
+        report = build_stats_report(results, time.perf_counter() - run_start)
+        if stats:
+            print_stats(report)
+        if stats_path:
+            with open(stats_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+    return results
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Extract URL query parameters in CSV files into new columns."
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="CSV files to process, optionally gzip/zstd compressed (default: all *.csv, *.csv.gz and *.csv.zst files in the current directory).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process each file in two streaming passes with constant memory (for very large files).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to process files in parallel (default: 1).",
+    )
+    parser.add_argument(
+        "--stdout",
+        action="store_true",
+        help="Write the enriched CSV of a single input to stdout instead of rewriting it. Implied when the input is '-' (stdin).",
+    )
+    parser.add_argument(
+        "--lookahead",
+        type=int,
+        default=LOOKAHEAD_ROWS,
+        metavar="ROWS",
+        help=f"Rows read ahead with --stdout to choose parameter columns (default: {LOOKAHEAD_ROWS}). "
+             f"Parameters first seen later go to '{OVERFLOW_COLUMN}'. Not needed when --params lists exact names.",
+    )
+    parser.add_argument(
+        "--analyze",
+        action="store_true",
+        help="Do not rewrite files; print a JSON report of each parameter's fill rate, distinct count and top values.",
+    )
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="Write the --analyze report to FILE instead of stdout.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"Treat files as append-only logs: write enriched rows to <name>{ENRICHED_SUFFIX} and only process rows appended since the last run.",
+    )
+    parser.add_argument(
+        "--resumable",
+        action="store_true",
+        help=f"Checkpoint progress to <name>.csv{RESUME_SUFFIX} every {RESUME_CHECKPOINT_ROWS} rows so an interrupted run resumes where it stopped.",
+    )
+    parser.add_argument(
+        "--params",
+        type=lambda value: [name.strip() for name in value.split(',') if name.strip()],
+        metavar="NAMES",
+        help="Comma-separated parameter names or globs to extract (e.g. utm_source,clickid or 'utm_*').",
+    )
+    parser.add_argument(
+        "--expand-nested",
+        action="store_true",
+        help="Also extract the parameters of URLs nested in parameter values as prefixed columns (e.g. redirect.utm_source).",
+    )
+    parser.add_argument(
+        "--nested-depth",
+        type=int,
+        default=NESTED_DEPTH,
+        metavar="N",
+        help=f"Number of nested URL levels expanded by --expand-nested (default: {NESTED_DEPTH}).",
+    )
+    parser.add_argument(
+        "--max-params",
+        type=int,
+        metavar="N",
+        help=f"Give only the N most frequent parameters their own column and group the rest into '{OVERFLOW_COLUMN}'.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help="Output format: csv rewrites files in place; parquet or arrow write a columnar file next to each CSV (requires pyarrow).",
+    )
+    parser.add_argument(
+        "--sqlite",
+        metavar="DB",
+        help="Load rows into the SQLite database DB with an indexed (row_id, param, value) table instead of rewriting the CSV files.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print per-file and per-stage timings, rows/sec, bytes read and written, cache hit rates and peak memory.",
+    )
+    parser.add_argument(
+        "--stats-json",
+        metavar="FILE",
+        help="Write the --stats report as JSON to FILE.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=URL_CACHE_SIZE,
+        help=f"Number of distinct URLs whose parsed parameters are cached (default: {URL_CACHE_SIZE}, 0 disables).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        metavar="MB",
+        help="Split each file into chunks of about MB megabytes and parse them with the --jobs workers.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main execution."""
+    args = parse_args()
+    if args.jobs < 1:
+        raise SystemExit("--jobs must be at least 1")
+    if args.chunk_size is not None and args.chunk_size < 1:
+        raise SystemExit("--chunk-size must be at least 1")
+    if args.cache_size < 0:
+        raise SystemExit("--cache-size must not be negative")
+    if args.max_params is not None and args.max_params < 0:
+        raise SystemExit("--max-params must not be negative")
+    if args.nested_depth < 1:
+        raise SystemExit("--nested-depth must be at least 1")
+    nested_depth = args.nested_depth if args.expand_nested else 0
+    pipeline = args.stdout or args.files == ['-']
+    if args.analyze and (pipeline or args.stream or args.chunk_size or args.format != 'csv' or args.incremental
+                         or args.resumable or args.sqlite or args.max_params is not None
+                         or args.stats or args.stats_json):
+        raise SystemExit("--analyze cannot be combined with -/--stdout, --stream, --chunk-size, --format, --incremental, "
+                         "--resumable, --sqlite, --max-params, --stats or --stats-json")
+    if pipeline and (args.stream or args.jobs > 1 or args.chunk_size or args.format != 'csv' or args.incremental
+                     or args.resumable or args.sqlite or args.stats or args.stats_json):
+        raise SystemExit("-/--stdout cannot be combined with --stream, --jobs, --chunk-size, --format, --incremental, "
+                         "--resumable, --sqlite, --stats or --stats-json")
+    if args.format != 'csv':
+        from columnar_writer import pyarrow_available
+
+        if not pyarrow_available():
+            raise SystemExit("Error: pyarrow is required for --format parquet/arrow. Install it with: pip install pyarrow")
+        if args.chunk_size:
+            raise SystemExit("--chunk-size only supports --format csv")
+    if args.incremental and (args.chunk_size or args.format != 'csv' or args.max_params is not None):
+        raise SystemExit("--incremental cannot be combined with --chunk-size, --format or --max-params")
+    if args.resumable and (args.chunk_size or args.format != 'csv' or args.incremental or args.sqlite):
+        raise SystemExit("--resumable cannot be combined with --chunk-size, --format, --incremental or --sqlite")
+    if args.sqlite and (args.jobs > 1 or args.chunk_size or args.format != 'csv' or args.incremental
+                        or args.max_params is not None):
+        raise SystemExit("--sqlite cannot be combined with --jobs, --chunk-size, --format, --incremental or --max-params")
+
+    if args.analyze:
+        analyze_csv_files(
+            args.files or None,
+            jobs=args.jobs,
+            cache_size=args.cache_size,
+            params=args.params,
+            report_path=args.report,
+            nested_depth=nested_depth,
+        )
+        return
+
+    if pipeline:
+        if len(args.files) > 1:
+            raise SystemExit("--stdout takes a single input file (or '-' for stdin)")
+        if args.lookahead < 1:
+            raise SystemExit("--lookahead must be at least 1")
+        if args.max_params is not None and declared_param_names(args.params):
+            raise SystemExit("--max-params has no effect when --params lists exact names in pipeline mode; "
+                             "drop one of them")
+        try:
+            result = run_pipeline(
+                args.files[0] if args.files else '-',
+                cache_size=args.cache_size,
+                max_params=args.max_params,
+                params=args.params,
+                lookahead_rows=args.lookahead,
+                nested_depth=nested_depth,
+            )
+        except BrokenPipeError:
+            # The downstream reader went away (e.g. head); stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        sys.exit(1 if result['status'] == 'error' else 0)
+
+    chunk_size = args.chunk_size * 1024 * 1024 if args.chunk_size else None
+    process_csv_files(
+        args.files or None,
+        stream=args.stream,
+        jobs=args.jobs,
+        chunk_size=chunk_size,
+        cache_size=args.cache_size,
+        max_params=args.max_params,
+        params=args.params,
+        output_format=args.format,
+        incremental=args.incremental,
+        sqlite_path=args.sqlite,
+        nested_depth=nested_depth,
+        stats=args.stats,
+        stats_path=args.stats_json,
+        resumable=args.resumable,
+    )
 
 
 if __name__ == '__main__':
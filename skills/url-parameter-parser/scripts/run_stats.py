@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Run Statistics for the URL Parameter Parser
+
+Accumulates per-stage wall time and row counts while a file is processed
+(see --stats). A disabled instance costs nothing on the hot path: its stage
+timers are no-ops and timed() returns the function unchanged.
+"""
+
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Stage names in report order
+STAGES = ('discover', 'read', 'parse', 'plan', 'write', 'rename')
+
+
+def peak_rss_bytes(children=False):
+    """
+    Returns the peak resident set size of this process, or of its largest
+    finished child process, in bytes; None where the resource module is missing.
+
+    Args:
+        children: Report the largest reaped child (e.g. pool workers) instead
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+class RunStats:
+    """Per-stage wall time, rows and bytes for one file."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.rows = None
+        self.bytes_written = None
+
+    @contextmanager
+    def _timer(self, name, exclude):
+        nested = sum(self.stages.get(other, 0.0) for other in exclude)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(name, elapsed - (sum(self.stages.get(other, 0.0) for other in exclude) - nested))
+
+    def stage(self, name, exclude=()):
+        """
+        Returns a context manager adding its wall time to stage name.
+
+        Args:
+            name: Stage name
+            exclude: Stages timed inside the block (e.g. with timed()) whose
+                time is not counted again for name
+        """
+        return self._timer(name, exclude) if self.enabled else nullcontext()
+
+    def add(self, name, seconds):
+        """Adds seconds of wall time to stage name."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def timed(self, name, func):
+        """Wraps func so the time spent in each call is added to stage name."""
+        if not self.enabled:
+            return func
+        perf_counter = time.perf_counter
+        stages = self.stages
+
+        def wrapper(*args):
+            start = perf_counter()
+            try:
+                return func(*args)
+            finally:
+                stages[name] = stages.get(name, 0.0) + perf_counter() - start
+
+        return wrapper
+
+    def report(self, seconds, bytes_read, cache_hits, cache_misses):
+        """
+        Returns a JSON-serializable summary.
+
+        Args:
+            seconds: Wall time of the whole file
+            bytes_read: Size of the input file
+            cache_hits: URL cache hits while processing the file
+            cache_misses: URL cache misses while processing the file
+        """
+        lookups = cache_hits + cache_misses
+        ordered = [name for name in STAGES if name in self.stages] + sorted(set(self.stages) - set(STAGES))
+        return {
+            'seconds': round(seconds, 6),
+            'stages': {name: round(self.stages[name], 6) for name in ordered},
+            'rows': self.rows,
+            'rows_per_sec': round(self.rows / seconds, 1) if seconds and self.rows is not None else None,
+            'bytes_read': bytes_read,
+            'bytes_written': self.bytes_written,
+            'cache_hit_rate': round(cache_hits / lookups, 6) if lookups else None,
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+
+
+# Shared disabled instance used when --stats is off
+NO_STATS = RunStats(enabled=False)
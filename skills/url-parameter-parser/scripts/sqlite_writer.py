@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+SQLite Output for the URL Parameter Parser
+
+Loads CSV rows and their URL parameters into one SQLite database so single
+values (a clickid, a campaign) can be looked up through an index instead of
+scanning every CSV. Parameters are stored normalized, one (row_id, param,
+value) record per value:
+
+    SELECT r.row_number, r.data FROM params p JOIN csv_rows r USING (row_id)
+    WHERE p.param = 'clickid' AND p.value = 'abc123';
+"""
+
+import json
+import sqlite3
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    headers TEXT NOT NULL,
+    url_column TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    loaded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS csv_rows (
+    row_id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (file_id),
+    row_number INTEGER NOT NULL,
+    url TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS params (
+    row_id INTEGER NOT NULL REFERENCES csv_rows (row_id),
+    param TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+"""
+
+# Created after the first bulk load, which is faster than maintaining them row by row
+INDEXES = """
+CREATE INDEX IF NOT EXISTS params_param_value ON params (param, value);
+CREATE INDEX IF NOT EXISTS params_row_id ON params (row_id);
+CREATE INDEX IF NOT EXISTS csv_rows_file_id ON csv_rows (file_id, row_number);
+"""
+
+# Number of CSV rows inserted per executemany batch
+INSERT_BATCH_ROWS = 5000
+
+
+class SQLiteWriter:
+    """
+    Writes the rows of one CSV file into a SQLite database in a single transaction.
+
+    Loading a file that is already in the database replaces its previous rows,
+    so reruns do not duplicate data. Rows are given to writerow (or writerows)
+    with their parsed parameters and inserted with executemany in batches of
+    batch_rows.
+    """
+
+    def __init__(self, db_path, source_path, fieldnames, url_column, batch_rows=INSERT_BATCH_ROWS):
+        self.fieldnames = list(fieldnames)
+        # The last of duplicate URL columns, as csv.DictReader and url_column_index pick
+        self.url_index = len(self.fieldnames) - 1 - self.fieldnames[::-1].index(url_column)
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self.row_batch = []
+        self.param_batch = []
+
+        self.connection = sqlite3.connect(str(db_path), isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        self._delete_file(cursor, str(source_path))
+        cursor.execute(
+            "INSERT INTO files (path, headers, url_column) VALUES (?, ?, ?)",
+            (str(source_path), json.dumps(self.fieldnames, ensure_ascii=False), url_column),
+        )
+        self.file_id = cursor.lastrowid
+        self.next_row_id = cursor.execute("SELECT COALESCE(MAX(row_id), 0) + 1 FROM csv_rows").fetchone()[0]
+
+    @staticmethod
+    def _delete_file(cursor, path):
+        row = cursor.execute("SELECT file_id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        file_id = row[0]
+        cursor.execute(
+            "DELETE FROM params WHERE row_id IN (SELECT row_id FROM csv_rows WHERE file_id = ?)", (file_id,)
+        )
+        cursor.execute("DELETE FROM csv_rows WHERE file_id = ?", (file_id,))
+        cursor.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+
+    def writerow(self, values, params):
+        """Buffers one row and its parameters, inserting a batch once batch_rows are pending."""
+        row_id = self.next_row_id
+        self.next_row_id += 1
+        self.rows_written += 1
+        url = values[self.url_index] if len(values) > self.url_index else None
+        self.row_batch.append(
+            (row_id, self.file_id, self.rows_written, url, json.dumps(values, ensure_ascii=False))
+        )
+        for name, param_values in params.items():
+            for value in param_values:
+                self.param_batch.append((row_id, name, value))
+        if len(self.row_batch) >= self.batch_rows:
+            self.flush()
+
+    def writerows(self, records):
+        """Buffers (row values, params) pairs (see writerow)."""
+        for values, params in records:
+            self.writerow(values, params)
+
+    def flush(self):
+        """Inserts the buffered rows and parameter values."""
+        if self.row_batch:
+            self.connection.executemany(
+                "INSERT INTO csv_rows (row_id, file_id, row_number, url, data) VALUES (?, ?, ?, ?, ?)",
+                self.row_batch,
+            )
+            self.row_batch = []
+        if self.param_batch:
+            self.connection.executemany("INSERT INTO params (row_id, param, value) VALUES (?, ?, ?)", self.param_batch)
+            self.param_batch = []
+
+    def close(self):
+        """Inserts pending rows, commits the transaction and builds any missing indexes."""
+        self.flush()
+        self.connection.execute("UPDATE files SET row_count = ? WHERE file_id = ?", (self.rows_written, self.file_id))
+        self.connection.execute("COMMIT")
+        self.connection.executescript(INDEXES)
+        self.connection.close()
+
+    def abort(self):
+        """Rolls back everything written for this file."""
+        self.connection.execute("ROLLBACK")
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Directory Watch Mode for the URL Parameter Parser
+
+Watches a directory for CSV files that finish landing and enriches each one
+once, in a long-running worker pool. New files are detected with inotify on
+Linux (files closed after writing or moved into the directory) and by polling
+for files whose size and modification time have stopped changing elsewhere.
+
+Files are tracked by content hash in a state file, so a file is never
+processed twice: neither when it is dropped again unchanged, nor when the
+rewritten output triggers another event.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from hashlib import blake2b
+from pathlib import Path
+
+from process_csv import (
+    CSV_GLOBS,
+    ENRICHED_SUFFIX,
+    NESTED_DEPTH,
+    URL_CACHE_SIZE,
+    configure_url_parser,
+    process_one_file,
+    processing_options,
+)
+
+
+# Default state file, kept in the watched directory
+STATE_FILE = '.url_parser_state.json'
+
+# Seconds between directory scans in polling mode, and between checks for finished work
+POLL_INTERVAL = 2.0
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def file_hash(path):
+    """
+    Hashes the content of a file.
+
+    Args:
+        path: Path of the file
+
+    Returns:
+        Hex digest string
+    """
+    digest = blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_csv_name(name):
+    """Returns True if a file name matches CSV_GLOBS and is not an incremental-mode output."""
+    return (not name.startswith('.') and not name.endswith(ENRICHED_SUFFIX)
+            and any(fnmatch(name, pattern) for pattern in CSV_GLOBS))
+
+
+class InotifyWatcher:
+    """Reports files closed after writing or moved into a directory, using inotify."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+        self.directory = Path(directory)
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds for files to finish landing.
+
+        Returns:
+            List of Paths
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                paths.append(self.directory / os.fsdecode(name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Reports files whose size and modification time held still between two scans."""
+
+    def __init__(self, directory, interval=POLL_INTERVAL):
+        self.directory = Path(directory)
+        self.interval = interval
+        self.seen = {}
+        self.reported = {}
+
+    def wait(self, timeout):
+        """
+        Sleeps for the poll interval (at most timeout seconds) and rescans.
+
+        Returns:
+            List of Paths
+        """
+        time.sleep(min(timeout, self.interval))
+        current = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and is_csv_name(entry.name):
+                stat = entry.stat()
+                current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+
+        # Report each settled version of a file once
+        settled = []
+        for path, signature in current.items():
+            if self.seen.get(path) == signature and self.reported.get(path) != signature:
+                settled.append(Path(path))
+                self.reported[path] = signature
+        self.reported = {path: signature for path, signature in self.reported.items() if path in current}
+        self.seen = current
+        return settled
+
+    def close(self):
+        pass
+
+
+def make_watcher(directory, polling=False, interval=POLL_INTERVAL):
+    """
+    Creates an inotify watcher, falling back to polling where inotify is unavailable.
+
+    Args:
+        directory: Directory to watch
+        polling: Always poll (e.g. on network filesystems where inotify sees no events)
+        interval: Seconds between scans when polling
+
+    Returns:
+        Watcher with wait(timeout) and close() methods
+    """
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling every {interval}s instead.")
+    return PollingWatcher(directory, interval)
+
+
+class ProcessedState:
+    """Content hashes of files already processed, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.hashes = json.load(f).get('hashes', {})
+        except (OSError, ValueError):
+            self.hashes = {}
+
+    def __contains__(self, digest):
+        return digest in self.hashes
+
+    def add(self, digest, path, status):
+        self.hashes[digest] = {
+            'path': str(path),
+            'status': status,
+            'at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'hashes': self.hashes}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def init_worker(cache_size, params, nested_depth):
+    """
+    Configures a pool worker.
+
+    Workers ignore SIGINT: a Ctrl-C in the terminal reaches the whole process
+    group, and only the parent should react to it by draining in-flight files.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_url_parser(cache_size, params, nested_depth)
+
+
+def watch(directory, options, jobs=1, cache_size=URL_CACHE_SIZE, params=None, nested_depth=0,
+          state_path=None, polling=False, interval=POLL_INTERVAL, once=False):
+    """
+    Processes CSV files as they land in directory until interrupted.
+
+    Files already present are processed first. Each file is hashed before it
+    is queued and again after it is rewritten; both hashes are recorded, so
+    neither an unchanged re-drop nor the tool's own output is processed again.
+
+    Args:
+        directory: Directory to watch
+        options: Processing options (see process_csv.processing_options)
+        jobs: Number of worker processes
+        cache_size: Number of distinct URLs kept in each worker's parse cache
+        params: List of parameter names or globs to extract
+        nested_depth: Number of levels of nested URLs to expand
+        state_path: Path of the state file (default: STATE_FILE in directory)
+        polling: Poll instead of using inotify
+        interval: Seconds between scans when polling
+        once: Process the files already present, then exit
+    """
+    directory = Path(directory)
+    state = ProcessedState(state_path or directory / STATE_FILE)
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    in_flight = {}
+    watcher = None if once else make_watcher(directory, polling, interval)
+
+    def submit(path):
+        if any(path == queued for queued, _ in in_flight.values()):
+            return
+        if not path.is_file() or not is_csv_name(path.name):
+            return
+        try:
+            digest = file_hash(path)
+        except OSError:
+            return
+        if digest in state:
+            return
+        print(f"Processing {path}...", flush=True)
+        in_flight[executor.submit(process_one_file, path, options)] = (path, digest)
+
+    def collect(done):
+        for future in done:
+            path, digest = in_flight.pop(future)
+            result = future.result()
+            print(result['message'], flush=True)
+            # Errors are not recorded, so the file is retried when it is seen again
+            if result['status'] != 'error':
+                state.add(digest, path, result['status'])
+            if result['status'] == 'processed' and path.exists():
+                state.add(file_hash(path), path, 'output')
+        if done:
+            state.save()
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(cache_size, params, nested_depth)) as executor:
+        try:
+            for pattern in CSV_GLOBS:
+                for path in sorted(directory.glob(pattern)):
+                    submit(path)
+
+            if once:
+                collect(wait(list(in_flight)).done)
+                return
+
+            print(f"Watching {directory} with {type(watcher).__name__} and {jobs} workers...", flush=True)
+            while not stopping:
+                if in_flight:
+                    done, _ = wait(list(in_flight), timeout=0, return_when=FIRST_COMPLETED)
+                    collect(done)
+                for path in watcher.wait(interval if not in_flight else min(interval, 0.5)):
+                    submit(path)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if watcher is not None:
+                watcher.close()
+            if in_flight:
+                print(f"Stopping; waiting for {len(in_flight)} files in progress...", flush=True)
+                collect(wait(list(in_flight)).done)
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Watch a directory and extract URL parameters from each CSV file that lands in it."
+    )
+    parser.add_argument("directory", nargs="?", default=".", help="Directory to watch (default: current directory).")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes (default: 1).")
+    parser.add_argument("--stream", action="store_true", help="Process files in two constant-memory passes.")
+    parser.add_argument(
+        "--params",
+        type=lambda value: [name.strip() for name in value.split(',') if name.strip()],
+        metavar="NAMES",
+        help="Comma-separated parameter names or globs to extract (e.g. utm_source,clickid or 'utm_*').",
+    )
+    parser.add_argument("--max-params", type=int, metavar="N", help="Maximum number of parameter columns per file.")
+    parser.add_argument("--expand-nested", action="store_true", help="Also extract parameters of nested URLs.")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=URL_CACHE_SIZE,
+        help=f"Number of distinct URLs whose parsed parameters are cached per worker (default: {URL_CACHE_SIZE}).",
+    )
+    parser.add_argument("--state", metavar="FILE", help=f"State file of processed hashes (default: <directory>/{STATE_FILE}).")
+    parser.add_argument("--poll", action="store_true", help="Poll the directory instead of using inotify.")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=POLL_INTERVAL,
+        help=f"Seconds between directory scans when polling (default: {POLL_INTERVAL}).",
+    )
+    parser.add_argument("--once", action="store_true", help="Process the files already present, then exit.")
+    return parser.parse_args()
+
+
+def main():
+    """Main execution."""
+    args = parse_args()
+    if args.jobs < 1:
+        raise SystemExit("--jobs must be at least 1")
+    if args.interval <= 0:
+        raise SystemExit("--interval must be positive")
+    if not os.path.isdir(args.directory):
+        raise SystemExit(f"Not a directory: {args.directory}")
+
+    watch(
+        args.directory,
+        processing_options(stream=args.stream, max_params=args.max_params),
+        jobs=args.jobs,
+        cache_size=args.cache_size,
+        params=args.params,
+        nested_depth=NESTED_DEPTH if args.expand_nested else 0,
+        state_path=args.state,
+        polling=args.poll,
+        interval=args.interval,
+        once=args.once,
+    )
+
+
+if __name__ == '__main__':
+    main()